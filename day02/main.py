@@ -1,34 +1,76 @@
+from itertools import product
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from intcode import Computer
+from intcode.sweep import sweep
+
+try:
+    from intcode.batch import BatchComputer
+except ImportError:  # NumPy isn't installed
+    BatchComputer = None
+
+
 def parse_input(filename):
     return tuple(map(int, open(filename).read().split(',')))
 
-def runner(data, noun, verb):
-    data = list(data)
-    data[1] = noun
-    data[2] = verb
-    position = 0
-    while 1:
-        op_code, x0, x1, y = data[position:position+4]
-        if op_code == 1:
-            data[y] = data[x0] + data[x1]
-        elif op_code == 2:
-            data[y] = data[x0] * data[x1]
-        else:
-            return data[0]
-        position += 4
-    return data[0]
+def runner(comp, noun, verb):
+    # load() only restores the pages the previous run wrote.
+    comp.load()
+    comp.set_addr(1, noun)
+    comp.set_addr(2, verb)
+    comp.run()
+    return comp.get_addr(0)
 
 def solve_1(data):
-    return runner(data, 12, 2)
+    return runner(Computer(data), 12, 2)
+
+def patch_noun_verb(comp, params):
+    comp.set_addr(1, params[0])
+    comp.set_addr(2, params[1])
+
+def read_result(comp):
+    return comp.get_addr(0)
+
+def is_target(value):
+    return value == 19690720
 
 def solve_2(data):
-    noun = 0
-    while 1:
-        for verb in range(100): # Assume verb can be at most 2 digits
-            if runner(data, noun, verb) == 19690720:
-                return(100*noun + verb)
-        else:
-            noun += 1
-        
-data = parse_input('input.txt')
-print(solve_1(data))
-print(solve_2(data))
+    """Sweep the noun/verb grid over a process pool, in noun-major order"""
+    # Assume noun and verb can be at most 2 digits
+    grid = product(range(100), range(100))
+    found = sweep(
+        data, patch_noun_verb, grid, result=read_result, match=is_target)
+    if found is None:
+        raise ValueError("No noun and verb give 19690720")
+    (noun, verb), __ = found
+    return 100*noun + verb
+
+def solve_2_batch(data):
+    """solve_2 over the whole 100x100 noun/verb grid in one batch"""
+    import numpy as np
+    comp = BatchComputer(data, 100 * 100)
+    nouns, verbs = np.divmod(np.arange(100 * 100), 100)
+    comp.set_addr(1, nouns)
+    comp.set_addr(2, verbs)
+    comp.run()
+    found = np.flatnonzero(comp.get_addr(0) == 19690720)
+    if not found.size:
+        raise ValueError("No noun and verb give 19690720")
+    return int(100*nouns[found[0]] + verbs[found[0]])
+
+def main():
+    data = parse_input('input.txt')
+    print(solve_1(data))
+    # The batch is faster where NumPy is installed; ``sweep`` picks the
+    # process pool anyway.
+    if BatchComputer is not None and sys.argv[1:] != ['sweep']:
+        print(solve_2_batch(data))
+    else:
+        print(solve_2(data))
+
+if __name__ == "__main__":
+    main()
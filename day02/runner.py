@@ -34,18 +34,27 @@ class Halt(Op):
         pass
 
 class Memory:
+    page_size = 64
+
     def load_from_file(self, fn):
         self.initial_memory = tuple(map(int, open(fn).read().split(',')))
         self.memory = list(self.initial_memory)
+        self.dirty = set()
 
     def reset(self):
-        self.memory = list(self.initial_memory)
+        # Copy back only the pages written since the last reset.
+        size = self.page_size
+        for page in self.dirty:
+            lo = page * size
+            self.memory[lo:lo + size] = self.initial_memory[lo:lo + size]
+        self.dirty.clear()
 
     def get(self, addr):
         return self.memory[addr]
 
     def set(self, addr, val):
         self.memory[addr] = val
+        self.dirty.add(addr // self.page_size)
 
 class Computer:
     ops = {
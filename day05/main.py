@@ -1,119 +1,12 @@
-input_file = "input.txt"
-
-
-class Computer:
-    OPERATIONS = {
-        1: 'add',
-        2: 'mul',
-        3: 'use_input',
-        4: 'ret_output',
-        5: 'jump_if_true',
-        6: 'jump_if_false',
-        7: 'less_than',
-        8: 'equals',
-        99: 'halt'
-    }
-
-    GET = 'get'
-    SET = 'set'
-    PARAM_TYPES = (GET, SET)
-
-    OP_SIGNATURES = {
-        'add': (GET, GET, SET),
-        'mul': (GET, GET, SET),
-        'less_than': (GET, GET, SET),
-        'equals': (GET, GET, SET),
-        'jump_if_true': (GET, GET),
-        'jump_if_false': (GET, GET),
-        'use_input': (SET,),
-        'ret_output': (GET,),
-        'halt': ()
-    }
-
-    def __init__(self, program):
-        self.program = tuple(program)
-        self.memory = list(program)
-        self.instruction_pointer = 0
-        self.parameter_mode = 0
-        self.input_vals = []
-        self.halted = True
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.parameter_mode = 0
-        self.halted = True
-
-    def run(self, input_vals=[]):
-        if not isinstance(input_vals, (tuple, list)):
-            input_vals = [input_vals]
-        self.input_vals.extend(input_vals)
-        self.halted = False
-        while not self.halted:
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        sigs = self.OP_SIGNATURES[self.OPERATIONS[opcode]]
-        size = len(sigs) + 1
-        params = self.memory[ip + 1:ip + size]
-        self.instruction_pointer += size # gets changed later in jump functions
-        dparams = [] # parameters dereferenced according to mode
-        for param, mode in zip(params, modes):
-            val = param
-            if mode == 0:
-                val = self.memory[val]
-            dparams.append(val)
-        func = self.get_func_for_opcode(opcode)
-        get_params = [p for p, sig in zip(dparams, sigs) if sig == self.GET]
-        set_params = [p for p, sig in zip(params, sigs) if sig == self.SET]
-        res = func(*get_params)
-        if not isinstance(res, tuple):
-            res = (res,)
-        # If set_params is empty, this does nothing.
-        for set_param, result in zip(set_params, res):
-            self.memory[set_param] = result
+import os
+import sys
 
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        modes = "{:03d}".format(opcode // 100)
-        modes = tuple(map(int, modes[::-1]))
-        return (normal_opcode, modes)
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-    def get_func_for_opcode(self, opcode):
-        return getattr(self, self.OPERATIONS[opcode])
+from intcode import Computer
 
-    def add(self, x, y):
-        return x + y
-
-    def mul(self, x, y):
-        return x * y
-
-    def less_than(self, x, y):
-        return int(x < y)
-
-    def equals(self, x, y):
-        return int(x == y)
-
-    def use_input(self):
-        return self.input_vals.pop(0)
-
-    def ret_output(self, x):
-        self.output_val = x
-
-    def jump_if_true(self, x, y):
-        if x:
-            self.instruction_pointer = y
-
-    def jump_if_false(self, x, y):
-        return self.jump_if_true(not(x), y)
-
-    def halt(self):
-        self.halted = True
+input_file = "input.txt"
 
 
 def main():
@@ -121,9 +14,9 @@ def main():
     data = list(map(int, text.split(',')))
     computer = Computer(data)
     computer.load()
-    print(computer.run(1))
+    print(computer.run_to_halt([1])[-1])
     computer.load()
-    print(computer.run(5))
+    print(computer.run_to_halt([5])[-1])
 
 
 main()
@@ -1,177 +1,21 @@
-from itertools import cycle, permutations
+from concurrent.futures import ProcessPoolExecutor
+from itertools import cycle, permutations, repeat
+import os
+import sys
+import time
 
-filename = "input.txt"
-
-class Computer:
-    def __init__(self, program):
-        self.program = tuple(program)
-        self.memory = list(program)
-        self.instruction_pointer = 0
-        self.parameter_mode = 0
-        self.input_vals = []
-        self.halted = True
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.parameter_mode = 0
-        self.input_vals = []
-
-    def run(self, input_vals=[]):
-        self.input_vals.extend(input_vals)
-        self.halted = False
-        while 1:
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        func = self.get_func_for_opcode(opcode)
-        return func(modes)
-
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        mode_1 = (opcode//100) % 10
-        mode_2 = (opcode//1000) % 10
-        mode_3 = (opcode//10000) % 10
-        return (normal_opcode, (mode_1, mode_2, mode_3))
-
-    def get_func_for_opcode(self, opcode):
-        if opcode == 1:
-            return self.add
-        if opcode == 2:
-            return self.mul
-        if opcode == 3:
-            return self.use_input
-        if opcode == 4:
-            return self.ret_output
-        if opcode == 5:
-            return self.jump_if_true
-        if opcode == 6:
-            return self.jump_if_false
-        if opcode == 7:
-            return self.less_than
-        if opcode == 8:
-            return self.equals
-        if opcode == 99:
-            return self.halt
-
-    def add(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 4]
-        if modes[0] == 0:
-            x0 = self.memory[params[0]]
-        else:
-            x0 = params[0]
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-        if modes[1] == 0:
-            x1 = self.memory[params[1]]
-        else:
-            x1 = params[1]
-        self.memory[params[2]] = x0 + x1
-        self.instruction_pointer += 4
-
-    def mul(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 4]
-        if modes[0] == 0:
-            x0 = self.memory[params[0]]
-        else:
-            x0 = params[0]
+from intcode import Computer
+from intcode.pipeline import Pipeline
 
-        if modes[1] == 0:
-            x1 = self.memory[params[1]]
-        else:
-            x1 = params[1]
-        self.memory[params[2]] = x0 * x1
-        self.instruction_pointer += 4
-
-    def use_input(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 2]
-        self.memory[params[0]] = self.get_input()
-        self.instruction_pointer += 2
-
-    def ret_output(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 2]
-        self.output_val = self.memory[params[0]]
-        self.instruction_pointer += 2
-        return 1
-
-    def jump_if_true(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 3]
-        if modes[0] == 0:
-            test_val = self.memory[params[0]]
-        else:
-            test_val = params[0]
-        if modes[1] == 0:
-            addr = self.memory[params[1]]
-        else:
-            addr = params[1]
-        if test_val:
-            self.instruction_pointer = addr
-        else:
-            self.instruction_pointer += 3
-
-    def jump_if_false(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 3]
-        if modes[0] == 0:
-            test_val = self.memory[params[0]]
-        else:
-            test_val = params[0]
-        if modes[1] == 0:
-            addr = self.memory[params[1]]
-        else:
-            addr = params[1]
-        if test_val == 0:
-            self.instruction_pointer = addr
-        else:
-            self.instruction_pointer += 3
-
-    def less_than(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 4]
-        if modes[0] == 0:
-            x0 = self.memory[params[0]]
-        else:
-            x0 = params[0]
-
-        if modes[1] == 0:
-            x1 = self.memory[params[1]]
-        else:
-            x1 = params[1]
-        self.memory[params[2]] = int(x0 < x1)
-        self.instruction_pointer += 4
-
-    def equals(self, modes):
-        ip = self.instruction_pointer
-        params = self.memory[ip + 1:ip + 4]
-        if modes[0] == 0:
-            x0 = self.memory[params[0]]
-        else:
-            x0 = params[0]
-
-        if modes[1] == 0:
-            x1 = self.memory[params[1]]
-        else:
-            x1 = params[1]
-        self.memory[params[2]] = int(x0 == x1)
-        self.instruction_pointer += 4
-
-    def halt(self, model):
-        self.instruction_pointer += 1
-        self.halted = True
-        return 1
-
-    def get_input(self):
-        return self.input_vals.pop(0)
+try:
+    from intcode.batch import BatchComputer
+except ImportError:  # NumPy isn't installed
+    BatchComputer = None
 
+filename = "input.txt"
 
 def solve_1(data):
     perms = permutations(range(5), 5)
@@ -185,6 +29,16 @@ def solve_1(data):
         outputs.append(next_input)
     return max(outputs)
 
+def solve_1_batch(data):
+    """solve_1 with each amplifier stage run for all 120 phases at once"""
+    import numpy as np
+    perms = np.array(list(permutations(range(5), 5)))
+    signals = np.zeros(len(perms), dtype=np.int64)
+    for stage in range(5):
+        comp = BatchComputer(data, len(perms))
+        signals = comp.run(np.stack([perms[:, stage], signals], axis=1))[:, 0]
+    return int(signals.max())
+
 def solve_2(data):
     perms = permutations(range(5, 10), 5)
     computers = [Computer(data) for __ in range(5)]
@@ -193,7 +47,7 @@ def solve_2(data):
         next_input = 0
         for phase, comp in zip(perm, computers):
             comp.load()
-            comp.input_vals = [phase]
+            comp.input_vals.append(phase)
         for phase, comp in cycle(zip(perm, computers)):
             next_input = comp.run([next_input])
             if comp.halted:
@@ -202,10 +56,115 @@ def solve_2(data):
         outputs.append(next_input)
     return max(outputs)
 
+class AmplifierSearch:
+    """
+    Evaluates amplifier chains for a set of phase permutations.
+
+    Without feedback an amplifier's output depends only on its phase and
+    input signal, and permutations that share a prefix feed the same
+    signals along it, so outputs are memoised by (phase, signal): only the
+    untried suffix of each permutation runs. Feedback loops keep state in
+    every amplifier between rounds and always run in full, as a pipeline
+    with each amplifier's output channel feeding the next one's input.
+    """
+
+    def __init__(self, data):
+        self.comp = Computer(data)
+        self.pipeline = Pipeline()
+        self.computers = [
+            self.pipeline.add(Computer(data)) for __ in range(5)]
+        for i, src in enumerate(self.computers):
+            dst = self.computers[(i + 1) % 5]
+            self.pipeline.connect(src, dst, capacity=4)
+        self.outputs = {}  # (phase, signal) -> output
+        self.hits = 0
+        self.misses = 0
+
+    def amplify(self, phase, signal):
+        key = (phase, signal)
+        if key in self.outputs:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.comp.load()
+            self.outputs[key] = self.comp.run([phase, signal])
+        return self.outputs[key]
+
+    def chain(self, perm):
+        signal = 0
+        for phase in perm:
+            signal = self.amplify(phase, signal)
+        return signal
+
+    def feedback_loop(self, perm):
+        for comp in self.computers:
+            comp.load()
+        for phase, comp in zip(perm, self.computers):
+            comp.input_vals.append(phase)
+        self.computers[0].input_vals.append(0)
+        self.pipeline.run()
+        return self.computers[-1].output_val
+
+def search_from(data, first, phases, feedback):
+    """
+    Best signal over the permutations of phases that start with first.
+
+    Runs in a worker process. Returns (best, permutations, hits, misses).
+    """
+    search = AmplifierSearch(data)
+    evaluate = search.feedback_loop if feedback else search.chain
+    rest = [phase for phase in phases if phase != first]
+    best = None
+    count = 0
+    for perm in permutations(rest):
+        signal = evaluate((first,) + perm)
+        if best is None or signal > best:
+            best = signal
+        count += 1
+    return best, count, search.hits, search.misses
+
+def solve_parallel(data, phases, feedback=False):
+    """
+    Search every permutation of phases over a process pool.
+
+    Each worker takes the permutations starting with one phase, so those
+    sharing a prefix share a cache. On a single CPU the work runs in this
+    process instead. Returns (best, perms per second, cache
+    hit rate).
+    """
+    start = time.perf_counter()
+    args = (repeat(data), phases, repeat(phases), repeat(feedback))
+    if (os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(search_from, *args))
+    else:
+        # A single worker process would only add start-up and pickling.
+        results = list(map(search_from, *args))
+    elapsed = time.perf_counter() - start
+    best = max(result[0] for result in results)
+    count = sum(result[1] for result in results)
+    hits = sum(result[2] for result in results)
+    lookups = hits + sum(result[3] for result in results)
+    return best, count / elapsed, hits / lookups if lookups else 0
+
 def main():
     f = open(filename)
     data = list(map(int, f.read().split(',')))
-    print(solve_1(data))
-    print(solve_2(data))
-
-main()
+    if sys.argv[1:] == ['serial']:
+        # One permutation at a time, for comparison.
+        if BatchComputer is not None:
+            print(solve_1_batch(data))
+        else:
+            print(solve_1(data))
+        print(solve_2(data))
+        return
+    for phases, feedback in ((range(5), False), (range(5, 10), True)):
+        best, rate, hit_rate = solve_parallel(data, tuple(phases), feedback)
+        print(best)
+        stats = "{:,.0f} perms/s".format(rate)
+        if not feedback:
+            stats += ", cache hit rate {:.0%}".format(hit_rate)
+        print(stats, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,147 +1,12 @@
+from collections import deque
+import os
+import sys
 import time
 
-class HaltedError(Exception):
-    pass
-
-class Computer:
-    OPERATIONS = {
-        1: 'add',
-        2: 'mul',
-        3: 'use_input',
-        4: 'ret_output',
-        5: 'jump_if_true',
-        6: 'jump_if_false',
-        7: 'less_than',
-        8: 'equals',
-        9: 'offset_rel_base',
-        99: 'halt'
-    }
-
-    GET = 'get'
-    SET = 'set'
-
-    OP_SIGNATURES = {
-        'add': (GET, GET, SET),
-        'mul': (GET, GET, SET),
-        'less_than': (GET, GET, SET),
-        'equals': (GET, GET, SET),
-        'jump_if_true': (GET, GET),
-        'jump_if_false': (GET, GET),
-        'offset_rel_base': (GET,),
-        'use_input': (SET,),
-        'ret_output': (GET,),
-        'halt': ()
-    }
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-    def __init__(self, program):
-        self.program = tuple(program)
-        self.memory = list(program)
-        self.instruction_pointer = 0
-        self.relative_base = 0
-        self.input_vals = []
-        self.halted = True
-        self.paused = True
-        self.input_getter = None
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.relative_base = 0
-        self.parameter_mode = 0
-        self.halted = False
-        self.paused = True
-
-    def get_addr(self, addr):
-        if addr > len(self.memory) - 1:
-            extra = addr - len(self.memory) + 1
-            self.memory.extend([0] * extra)
-        return self.memory[addr]
-
-    def set_addr(self, addr, val):
-        self.memory[addr] = val
-
-    def run(self, input_vals=[]):
-        if self.halted:
-            raise HaltedError
-        if not isinstance(input_vals, (tuple, list)):
-            input_vals = [input_vals]
-        self.input_vals.extend(input_vals)
-        self.paused = False
-        while not (self.halted or self.paused):
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        sigs = self.OP_SIGNATURES[self.OPERATIONS[opcode]]
-        size = len(sigs) + 1
-        params = self.memory[ip + 1:ip + size]
-        self.instruction_pointer += size # gets changed later in jump functions
-        for index in range(len(params)):
-            mode = modes[index]
-            if modes[index] == 2:
-                params[index] += self.relative_base
-
-        dparams = [] # parameters dereferenced according to mode
-        for param, mode in zip(params, modes):
-            if mode in (0, 2):
-                param = self.get_addr(param)
-            dparams.append(param)
-        func = self.get_func_for_opcode(opcode)
-        get_params = [p for p, sig in zip(dparams, sigs) if sig == self.GET]
-        set_params = [p for p, sig in zip(params, sigs) if sig == self.SET]
-        res = func(*get_params)
-        if not isinstance(res, tuple):
-            res = (res,)
-        # If set_params is empty, this does nothing.
-        for set_param, result in zip(set_params, res):
-            self.set_addr(set_param, result)
-
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        modes = "{:03d}".format(opcode // 100)
-        modes = tuple(map(int, modes[::-1]))
-        return (normal_opcode, modes)
-
-    def get_func_for_opcode(self, opcode):
-        return getattr(self, self.OPERATIONS[opcode])
-
-    def add(self, x, y):
-        return x + y
-
-    def mul(self, x, y):
-        return x * y
-
-    def less_than(self, x, y):
-        return int(x < y)
-
-    def equals(self, x, y):
-        return int(x == y)
-
-    def use_input(self):
-        if not self.input_vals:
-            return self.input_getter()
-        return self.input_vals.pop(0)
-
-    def ret_output(self, x):
-        self.output_val = x
-        self.paused = True
-
-    def jump_if_true(self, x, y):
-        if x:
-            self.instruction_pointer = y
-
-    def jump_if_false(self, x, y):
-        return self.jump_if_true(not(x), y)
-
-    def halt(self):
-        self.halted = True
-
-    def offset_rel_base(self, x):
-        self.relative_base += x
+from intcode import Computer
 
 
 class Tile:
@@ -167,17 +32,7 @@ class Tile:
 def load_squares(data):
     comp = Computer(data)
     comp.load()
-    vals = []
-    while 1:
-        comp.run()
-        if comp.halted:
-            break
-        vals.append(comp.output_val)
-    squares = []
-    for i in range(len(vals)//3):
-        items = vals[i*3:(i+1)*3]
-        squares.append(items)
-    return squares
+    return [list(square) for square in comp.records(3)]
     
 
 def solve_1(data):
@@ -191,21 +46,9 @@ def solve_1(data):
 
 def build_display_and_get_score(comp):
     positions = {}
-    stop = False
-
-    while 1:
-        item = []
-        score = None
-        for i in range(3):
-            comp.run()
-            if comp.halted:
-                stop = True
-                print("Breaking with i={}".format(i))
-                break
-            item.append(comp.output_val)
-        if stop:
-            break
-        x, y, val = item
+    score = None
+
+    for x, y, val in comp.records(3):
         if (x, y) == (-1, 0):
             score = val
             break
@@ -223,19 +66,13 @@ def build_display_and_get_score(comp):
 
 
 def play_game(comp, game):
-    while 1:
-        item = []
-        for i in range(3):
-            comp.run()
-            if comp.halted:
-                print(game.score)
-                return
-            item.append(comp.output_val)
+    for item in comp.records(3):
         x, y, val = item
         if (x, y) == (-1, 0):
             game.score = val
         else:
             game.update(item)
+    return game.score
 
 
 class GameState:
@@ -275,7 +112,7 @@ def solve_2(data):
     display, score = build_display_and_get_score(comp)
     game = GameState(display, score)
 
-    def ai_player():
+    def ai_player(comp):
         paddle = game.find_paddle()
         ball = game.find_ball()
 
@@ -288,11 +125,153 @@ def solve_2(data):
 
     comp.input_getter = ai_player
 
-    play_game(comp, game)
-    
+    return play_game(comp, game)
+
+
+class HeadlessGame:
+    """
+    Plays the game to the end without building a display.
+
+    The ball and paddle are tracked as the outputs arrive, so choosing a
+    joystick move costs nothing. Outputs go to a sink and the machine
+    blocks on input, so each ``run`` plays one frame: every tile update up
+    to the next joystick read comes back in one call, to be read off in
+    (x, y, tile) triples. Pass ``keep_tiles`` to also keep every tile, for
+    ``print_display``.
+    """
+
+    def __init__(self, data, keep_tiles=False):
+        self.comp = Computer(data)
+        self.comp.set_addr(0, 2)  # insert coins
+        self.comp.block_on_input = True
+        self.comp.output_sink = deque()
+        self.tiles = {} if keep_tiles else None
+        self.ball_x = None
+        self.paddle_x = None
+        self.score = None
+        self.frames = 0
+
+    def play(self):
+        """Play until the game halts, returning the final score."""
+        while self.play_frame():
+            pass
+        return self.score
+
+    def play_frame(self):
+        """Play up to the next joystick move. False once the game is over."""
+        comp = self.comp
+        outputs = comp.output_sink
+        comp.run()
+        while outputs:
+            x = outputs.popleft()
+            y = outputs.popleft()
+            val = outputs.popleft()
+            if (x, y) == (-1, 0):
+                self.score = val
+                continue
+            if val == Tile.BALL:
+                self.ball_x = x
+            elif val == Tile.PADDLE:
+                self.paddle_x = x
+            if self.tiles is not None:
+                self.tiles[x, y] = val
+        if comp.halted:
+            return False
+        self.frames += 1
+        comp.input_vals.append(
+            (self.ball_x > self.paddle_x) - (self.ball_x < self.paddle_x))
+        return True
+
+    def print_display(self):
+        width = max(x for x, __ in self.tiles) + 1
+        height = max(y for __, y in self.tiles) + 1
+        for y in range(height):
+            print(''.join(Tile.display(self.tiles.get((x, y), Tile.EMPTY))
+                          for x in range(width)))
+        print("Score: {}".format(self.score))
+
+
+def find_fields(data, frames=200):
+    """
+    Find where the game keeps the ball's x, the paddle's x and the score.
+
+    Plays headless, keeping the addresses whose value matches what the
+    tiles show after every frame, until each field is down to one address.
+    """
+    game = HeadlessGame(data)
+    candidates = {}
+    for __ in range(frames):
+        if not game.play_frame():
+            break
+        mem = game.comp.memory
+        for name, val in (('ball_x', game.ball_x),
+                          ('paddle_x', game.paddle_x),
+                          ('score', game.score)):
+            found = {addr for addr in range(len(game.comp.program))
+                     if mem[addr] == val}
+            candidates[name] = candidates.get(name, found) & found
+        if all(len(addrs) == 1 for addrs in candidates.values()):
+            return {name: addrs.pop() for name, addrs in candidates.items()}
+    raise ValueError("Couldn't pin down the game's fields")
+
+
+class WatchedGame:
+    """
+    Plays the game by watching memory instead of reading tiles.
+
+    Outputs are collected and thrown away each frame. Watchpoints on the
+    ball's and paddle's x keep the joystick's view up to date as the
+    program writes them, and the score is read from memory once the game
+    halts.
+    """
+
+    def __init__(self, data, fields):
+        self.comp = Computer(data)
+        self.comp.set_addr(0, 2)  # insert coins
+        self.comp.output_sink = deque()
+        self.comp.input_getter = self.joystick
+        self.view = self.comp.view(fields)
+        self.ball_x = self.view.ball_x
+        self.paddle_x = self.view.paddle_x
+        self.comp.watch(fields['ball_x'], self.ball_moved)
+        self.comp.watch(fields['paddle_x'], self.paddle_moved)
+        self.frames = 0
+
+    def ball_moved(self, comp, addr, old, new):
+        self.ball_x = new
+
+    def paddle_moved(self, comp, addr, old, new):
+        self.paddle_x = new
+
+    def joystick(self, comp):
+        comp.output_sink.clear()
+        self.frames += 1
+        return (self.ball_x > self.paddle_x) - (self.ball_x < self.paddle_x)
+
+    def play(self):
+        """Play until the game halts, returning the final score."""
+        self.comp.run()
+        return self.view.score
+
+
 def main():
     data = list(map(int, open('input.txt').read().split(',')))
     print(solve_1(data))
-    solve_2(data)
-
-main()
+    if sys.argv[1:] == ['display']:
+        # Keep a full display and search it for each move, for comparison.
+        print(solve_2(list(data)))
+        return
+    start = time.perf_counter()
+    if sys.argv[1:] == ['watched']:
+        # Read the game's state from memory rather than from the tiles.
+        game = WatchedGame(data, find_fields(data))
+    else:
+        game = HeadlessGame(data)
+    print(game.play())
+    elapsed = time.perf_counter() - start
+    print("{:,} frames in {:.2f}s elapsed, {:,.0f} frames/s".format(
+        game.frames, elapsed, game.frames / elapsed), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,155 +1,11 @@
-from collections import namedtuple
+from collections import deque, namedtuple
+import os
+import sys
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-class HaltedError(Exception):
-    pass
-
-
-class Computer:
-    OPERATIONS = {
-        1: 'add',
-        2: 'mul',
-        3: 'use_input',
-        4: 'ret_output',
-        5: 'jump_if_true',
-        6: 'jump_if_false',
-        7: 'less_than',
-        8: 'equals',
-        9: 'offset_rel_base',
-        99: 'halt'
-    }
-
-    GET = 'get'
-    SET = 'set'
-
-    OP_SIGNATURES = {
-        'add': (GET, GET, SET),
-        'mul': (GET, GET, SET),
-        'less_than': (GET, GET, SET),
-        'equals': (GET, GET, SET),
-        'jump_if_true': (GET, GET),
-        'jump_if_false': (GET, GET),
-        'offset_rel_base': (GET,),
-        'use_input': (SET,),
-        'ret_output': (GET,),
-        'halt': ()
-    }
-    instruction_pointer = 0
-    relative_base = 0
-    output_val = None
-    input_getter = None
-    halted = True
-    paused = True
-
-    def __init__(self, filename):
-        self.program = self.load_from_filename(filename)
-        self.memory = list(self.program)
-        self.input_vals = []
-
-    def load_from_filename(self, filename):
-        with open(filename) as f:
-            text = f.read()
-            return tuple(map(int, text.split(',')))
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.relative_base = 0
-        self.parameter_mode = 0
-        self.halted = False
-        self.paused = True
-
-    def get_addr(self, addr):
-        if addr > len(self.memory) - 1:
-            extra = addr - len(self.memory) + 1
-            self.memory.extend([0] * extra)
-        return self.memory[addr]
-
-    def set_addr(self, addr, val):
-        self.memory[addr] = val
-
-    def run(self, input_vals=[]):
-        if self.halted:
-            raise HaltedError
-        if not isinstance(input_vals, (tuple, list)):
-            input_vals = [input_vals]
-        self.input_vals.extend(input_vals)
-        self.paused = False
-        while not (self.halted or self.paused):
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        sigs = self.OP_SIGNATURES[self.OPERATIONS[opcode]]
-        size = len(sigs) + 1
-        params = self.memory[ip + 1:ip + size]
-        self.instruction_pointer += size  # gets changed later in jumps
-        for index in range(len(params)):
-            mode = modes[index]
-            if modes[index] == 2:
-                params[index] += self.relative_base
-
-        dparams = []  # parameters dereferenced according to mode
-        for param, mode in zip(params, modes):
-            if mode in (0, 2):
-                param = self.get_addr(param)
-            dparams.append(param)
-        func = self.get_func_for_opcode(opcode)
-        get_params = [p for p, sig in zip(dparams, sigs) if sig == self.GET]
-        set_params = [p for p, sig in zip(params, sigs) if sig == self.SET]
-        res = func(*get_params)
-        if not isinstance(res, tuple):
-            res = (res,)
-        # If set_params is empty, this does nothing.
-        for set_param, result in zip(set_params, res):
-            self.set_addr(set_param, result)
-
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        modes = "{:03d}".format(opcode // 100)
-        modes = tuple(map(int, modes[::-1]))
-        return (normal_opcode, modes)
-
-    def get_func_for_opcode(self, opcode):
-        return getattr(self, self.OPERATIONS[opcode])
-
-    def add(self, x, y):
-        return x + y
-
-    def mul(self, x, y):
-        return x * y
-
-    def less_than(self, x, y):
-        return int(x < y)
-
-    def equals(self, x, y):
-        return int(x == y)
-
-    def use_input(self):
-        if not self.input_vals:
-            return self.input_getter(self)
-        return self.input_vals.pop(0)
-
-    def ret_output(self, x):
-        self.output_val = x
-        self.paused = True
-
-    def jump_if_true(self, x, y):
-        if x:
-            self.instruction_pointer = y
-
-    def jump_if_false(self, x, y):
-        return self.jump_if_true(not(x), y)
-
-    def halt(self):
-        self.halted = True
-
-    def offset_rel_base(self, x):
-        self.relative_base += x
+from intcode import Computer
 
 
 class Vec(tuple):
@@ -211,16 +67,8 @@ class Droid:
     def plot_map(self):
         self.comp.load()
         def direction_getter(comp):
-            if self.path_in_progress:
-                comp.direction = self.path_in_progress.pop()
-                return comp.direction
-            node = self.to_investigate()
-            if node is None:
-                return 0
-            while node.parent is not None:
-                self.path_in_progress.append(node.direction)
-                node = node.parent
-            return direction_getter(comp)
+            comp.direction = self.next_direction()
+            return comp.direction or 0
 
         comp = self.comp
         comp.input_getter = direction_getter
@@ -231,16 +79,29 @@ class Droid:
             comp.run()
             if comp.halted:
                 break
-            output = comp.output_val
-            new_pos = self.pos + Movement.as_vector(comp.direction)
-            if output in (1, 2):
-                self.pos = new_pos
-                if output == 1:
-                    self.map[new_pos] = Tile.PATH
-                elif output == 2:
-                    self.map[new_pos] = Tile.OXYGEN
-            else:
-                self.map[new_pos] = Tile.WALL
+            self.record(comp.direction, comp.output_val)
+
+    def next_direction(self):
+        """The next move towards the nearest unexplored square, or None"""
+        if not self.path_in_progress:
+            node = self.to_investigate()
+            if node is None:
+                return None
+            while node.parent is not None:
+                self.path_in_progress.append(node.direction)
+                node = node.parent
+        return self.path_in_progress.pop()
+
+    def record(self, direction, output):
+        new_pos = self.pos + Movement.as_vector(direction)
+        if output in (1, 2):
+            self.pos = new_pos
+            if output == 1:
+                self.map[new_pos] = Tile.PATH
+            elif output == 2:
+                self.map[new_pos] = Tile.OXYGEN
+        else:
+            self.map[new_pos] = Tile.WALL
 
     def to_investigate(self):
         # Find the nearest unexplored square.
@@ -338,6 +199,67 @@ class Droid:
             return Tile.UNKNOWN
 
 
+class ForkExplorer:
+    """
+    Maps the maze by breadth-first search over machine states.
+
+    Every frontier cell keeps a snapshot of the droid standing on it. To
+    expand a cell, each unknown neighbour is tried by restoring that
+    snapshot and sending one move, so the droid never walks back through
+    the maze. The BFS gives the distance to the oxygen system directly;
+    the fill time is a second BFS over the finished map, with no Intcode.
+    """
+
+    def __init__(self, comp):
+        self.comp = comp
+        self.map = {}
+        self.oxygen = None
+        self.oxygen_distance = None
+
+    def explore(self):
+        comp = self.comp
+        comp.load()
+        start = Vec(0, 0)
+        self.map = {start: Tile.PATH}
+        frontier = [(start, comp.snapshot())]
+        distance = 0
+        while frontier:
+            distance += 1
+            new_frontier = []
+            for pos, snap in frontier:
+                for direction in Movement.DIRECTIONS:
+                    new_pos = pos + Movement.as_vector(direction)
+                    if new_pos in self.map:
+                        continue
+                    comp.restore(snap)
+                    output = comp.run([direction])
+                    if output == ResponseCode.HIT_WALL:
+                        self.map[new_pos] = Tile.WALL
+                        continue
+                    if output == ResponseCode.OXYGEN:
+                        self.map[new_pos] = Tile.OXYGEN
+                        self.oxygen = new_pos
+                        self.oxygen_distance = distance
+                    else:
+                        self.map[new_pos] = Tile.PATH
+                    new_frontier.append((new_pos, comp.snapshot()))
+            frontier = new_frontier
+
+    def fill_time(self):
+        """Minutes for oxygen to spread from the oxygen system everywhere"""
+        distances = {self.oxygen: 0}
+        to_do = deque([self.oxygen])
+        while to_do:
+            pos = to_do.popleft()
+            for vec in Movement.VECTORS.values():
+                new_pos = pos + vec
+                if (self.map.get(new_pos) in (Tile.PATH, Tile.OXYGEN)
+                        and new_pos not in distances):
+                    distances[new_pos] = distances[pos] + 1
+                    to_do.append(new_pos)
+        return max(distances.values())
+
+
 def solve_1(droid):
     return droid.distances_to_oxygens()[Vec(0, 0)]
 
@@ -348,11 +270,20 @@ def solve_2(droid):
 
 
 def main():
-    comp = Computer('input.txt')
-    droid = Droid(comp)
-    droid.plot_map()
-    print(solve_1(droid))
-    print(solve_2(droid))
+    comp = Computer.from_filename('input.txt')
+    if sys.argv[1:] == ['walk']:
+        # The walking droid, for comparison.
+        droid = Droid(comp)
+        droid.plot_map()
+        print(solve_1(droid))
+        print(solve_2(droid))
+        print("{:,} instructions".format(comp.instructions), file=sys.stderr)
+        return
+    explorer = ForkExplorer(comp)
+    explorer.explore()
+    print(explorer.oxygen_distance)
+    print(explorer.fill_time())
+    print("{:,} instructions".format(comp.instructions), file=sys.stderr)
 
 
 if __name__ == "__main__":
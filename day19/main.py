@@ -1,158 +1,22 @@
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right, insort
 from itertools import count
 import math
-filename = 'input.txt'
+import os
+import sys
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-class HaltedError(Exception):
-    pass
-
-
-class Computer:
-    OPERATIONS = {
-        1: 'add',
-        2: 'mul',
-        3: 'use_input',
-        4: 'ret_output',
-        5: 'jump_if_true',
-        6: 'jump_if_false',
-        7: 'less_than',
-        8: 'equals',
-        9: 'offset_rel_base',
-        99: 'halt'
-    }
-
-    GET = 'get'
-    SET = 'set'
-
-    OP_SIGNATURES = {
-        'add': (GET, GET, SET),
-        'mul': (GET, GET, SET),
-        'less_than': (GET, GET, SET),
-        'equals': (GET, GET, SET),
-        'jump_if_true': (GET, GET),
-        'jump_if_false': (GET, GET),
-        'offset_rel_base': (GET,),
-        'use_input': (SET,),
-        'ret_output': (GET,),
-        'halt': ()
-    }
-    instruction_pointer = 0
-    relative_base = 0
-    output_val = None
-    input_getter = None
-    halted = True
-    paused = True
-
-    def __init__(self, filename):
-        self.program = self.load_from_filename(filename)
-        self.memory = list(self.program)
-        self.input_vals = []
-
-    def load_from_filename(self, filename):
-        with open(filename) as f:
-            text = f.read()
-            return tuple(map(int, text.split(',')))
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.relative_base = 0
-        self.parameter_mode = 0
-        self.halted = False
-        self.paused = True
-
-    def get_addr(self, addr):
-        if addr > len(self.memory) - 1:
-            extra = addr - len(self.memory) + 1
-            self.memory.extend([0] * extra)
-        return self.memory[addr]
-
-    def set_addr(self, addr, val):
-        self.memory[addr] = val
-
-    def run(self, input_vals=[]):
-        if self.halted:
-            raise HaltedError
-        if not isinstance(input_vals, (tuple, list)):
-            input_vals = [input_vals]
-        self.input_vals.extend(input_vals)
-        self.paused = False
-        while not (self.halted or self.paused):
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        sigs = self.OP_SIGNATURES[self.OPERATIONS[opcode]]
-        size = len(sigs) + 1
-        params = self.memory[ip + 1:ip + size]
-        self.instruction_pointer += size  # gets changed later in jump
-        for index in range(len(params)):
-            mode = modes[index]
-            if modes[index] == 2:
-                params[index] += self.relative_base
-
-        dparams = []  # parameters dereferenced according to mode
-        for param, mode in zip(params, modes):
-            if mode in (0, 2):
-                param = self.get_addr(param)
-            dparams.append(param)
-        func = self.get_func_for_opcode(opcode)
-        get_params = [p for p, sig in zip(dparams, sigs) if sig == self.GET]
-        set_params = [p for p, sig in zip(params, sigs) if sig == self.SET]
-        res = func(*get_params)
-        if not isinstance(res, tuple):
-            res = (res,)
-        # If set_params is empty, this does nothing.
-        for set_param, result in zip(set_params, res):
-            self.set_addr(set_param, result)
-
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        modes = "{:03d}".format(opcode // 100)
-        modes = tuple(map(int, modes[::-1]))
-        return (normal_opcode, modes)
-
-    def get_func_for_opcode(self, opcode):
-        return getattr(self, self.OPERATIONS[opcode])
-
-    def add(self, x, y):
-        return x + y
-
-    def mul(self, x, y):
-        return x * y
-
-    def less_than(self, x, y):
-        return int(x < y)
-
-    def equals(self, x, y):
-        return int(x == y)
-
-    def use_input(self):
-        if not self.input_vals:
-            return self.input_getter(self)
-        return self.input_vals.pop(0)
-
-    def ret_output(self, x):
-        self.output_val = x
-        self.paused = True
-
-    def jump_if_true(self, x, y):
-        if x:
-            self.instruction_pointer = y
-
-    def jump_if_false(self, x, y):
-        return self.jump_if_true(not(x), y)
-
-    def halt(self):
-        self.halted = True
-
-    def offset_rel_base(self, x):
-        self.relative_base += x
+from intcode import Computer
+from intcode.memo import QueryCache
+from intcode.sweep import worker_pool
+
+try:
+    from intcode.batch import BatchComputer
+except ImportError:  # NumPy isn't installed
+    BatchComputer = None
+
+filename = 'input.txt'
 
 
 class BisectRange:
@@ -181,8 +45,12 @@ class TractorBeam:
     assumption to take shortcuts where possible.
     """
 
-    def __init__(self, filename):
-        self.comp = Computer(filename)
+    def __init__(self, filename, store=None, executor=None):
+        self.comp = Computer.from_filename(filename)
+        # A probe is a pure function of (x, y), so repeated ones are free.
+        self.cache = QueryCache(self.comp.program, store=store)
+        # A sweep.worker_pool for the program, to run batches of probes on.
+        self.executor = executor
         self.a = None
         self.b = None
         self.known_bounds = {0: (0, 0)}
@@ -198,9 +66,27 @@ class TractorBeam:
 
     def check_pos(self, x, y):
         self.calls += 1
-        self.comp.load()
-        self.comp.run([x, y])
-        return self.comp.output_val
+        return self.cache.query((x, y))[0]
+
+    def check_many(self, positions):
+        """check_pos for each (x, y), run as one batch."""
+        positions = list(positions)
+        self.calls += len(positions)
+        return [outputs[0] for outputs in
+                self.cache.query_many(positions, self.executor)]
+
+    def scan(self, width, height):
+        """
+        Probe every position in the width x height area as one batch.
+
+        Returns a height x width array of 0s and 1s. Needs NumPy.
+        """
+        import numpy as np
+        ys, xs = np.mgrid[0:height, 0:width]
+        comp = BatchComputer(self.comp.program, width * height)
+        outputs = comp.run(np.stack([xs.ravel(), ys.ravel()], axis=1))
+        self.calls += width * height
+        return outputs[:, 0].reshape(height, width)
 
     def get_for_pos(self, x, y):
         pass
@@ -236,12 +122,19 @@ class TractorBeam:
         return (lower_x, upper_x)
 
     def find_lower_bound(self, row, lower, upper):
+        if self.executor is not None:
+            # Probe every candidate at once rather than one per bisect step.
+            vals = self.check_many((v, row) for v in range(lower, upper + 1))
+            return lower + bisect_left(vals, 1)
         def func(v):
             return self.check_pos(v, row)
         bisector = BisectRange(func, lower, upper)
         return bisector.bisect(1)  # Where is first 1
 
     def find_upper_bound(self, row, lower, upper):
+        if self.executor is not None:
+            vals = self.check_many((v, row) for v in range(lower, upper + 1))
+            return lower + bisect_left([-v for v in vals], 0) - 1
         def func(v):
             return -self.check_pos(v, row)
         bisector = BisectRange(func, lower, upper)
@@ -299,6 +192,115 @@ class TractorBeam:
         return bounds
 
 
+class EdgeTracker:
+    """
+    Follows the left and right edges of the beam from row to row.
+
+    Relies on the same assumption as TractorBeam: each row's beam is one
+    run of squares whose edges grow roughly linearly with the row. The
+    edges of a row are predicted by scaling those of the nearest known
+    row below it, then corrected by galloping from the prediction and
+    bisecting. Predicting from the previous row is off by at most a
+    square, so walking down the rows costs a constant number of probes
+    per row, and far rows cost probes logarithmic in the prediction
+    error rather than in the row number.
+    """
+
+    def __init__(self, tractor_beam):
+        self.beam = tractor_beam
+        row, bounds = tractor_beam.find_nontrivial_row()
+        self.first_row = row
+        self.edges_of = {row: bounds}
+        self.rows = [row]  # sorted keys of edges_of
+
+    def probe(self, x, row):
+        return x >= 0 and self.beam.check_pos(x, row)
+
+    def edges(self, row):
+        """(left, right) for a row at or below first_row."""
+        if row in self.edges_of:
+            return self.edges_of[row]
+        if row < self.first_row:
+            raise ValueError("Row {} is above the tracked beam".format(row))
+        known = self.rows[bisect_right(self.rows, row) - 1]
+        left, right = self.edges_of[known]
+        guess_left = left * row // known
+        guess_right = (right * row + known - 1) // known
+        inside = (guess_left + guess_right) // 2
+        if not self.probe(inside, row):
+            raise ValueError("Lost the beam on row {}".format(row))
+        bounds = (self.edge(row, inside, guess_left, -1),
+                  self.edge(row, inside, guess_right, 1))
+        self.edges_of[row] = bounds
+        insort(self.rows, row)
+        return bounds
+
+    def edge(self, row, inside, guess, direction):
+        """
+        The last square of the beam going from ``inside`` in ``direction``.
+
+        ``inside`` must be in the beam; the search starts at ``guess``.
+        """
+        if (guess - inside) * direction < 0:
+            guess = inside
+        step = 1
+        if self.probe(guess, row):
+            last_in = guess
+            while self.probe(last_in + direction * step, row):
+                last_in += direction * step
+                step *= 2
+            first_out = last_in + direction * step
+        else:
+            first_out = guess
+            while True:
+                x = first_out - direction * step
+                if (x - inside) * direction <= 0:
+                    last_in = inside
+                    break
+                if self.probe(x, row):
+                    last_in = x
+                    break
+                first_out = x
+                step *= 2
+        while abs(first_out - last_in) > 1:
+            mid = (first_out + last_in) // 2
+            if self.probe(mid, row):
+                last_in = mid
+            else:
+                first_out = mid
+        return last_in
+
+    def fits(self, top, size):
+        """Whether a size x size square fits with its top on row top."""
+        bottom = top + size - 1
+        return self.edges(top)[1] - self.edges(bottom)[0] >= size - 1
+
+    def first_fit(self, size):
+        """
+        The top row of the first size x size square that fits.
+
+        Gallops down the rows doubling the distance until a square fits,
+        then binary searches the last stretch, so this costs O(log row)
+        edge lookups. The gallop starts with a step of ``size``.
+        """
+        lower = self.first_row
+        if self.fits(lower, size):
+            return lower
+        step = size  # no square fits much closer than its own size
+        upper = lower + step
+        while not self.fits(upper, size):
+            lower = upper
+            step *= 2
+            upper = lower + step
+        while upper - lower > 1:
+            mid = (lower + upper) // 2
+            if self.fits(mid, size):
+                upper = mid
+            else:
+                lower = mid
+        return upper
+
+
 def solve_1(tractor_beam, dimension):
     tot = 0
     for y in range(50):
@@ -312,7 +314,19 @@ def solve_1(tractor_beam, dimension):
     return tot
 
 
+def solve_1_grid(tractor_beam, dimension):
+    """solve_1 by probing the whole grid, as one batch."""
+    return sum(tractor_beam.check_many(
+        (x, y) for y in range(dimension) for x in range(dimension)))
+
+
 def solve_2(tractor_beam, dimension):
+    tracker = EdgeTracker(tractor_beam)
+    top = tracker.first_fit(dimension)
+    return 10000*tracker.edges(top + dimension - 1)[0] + top
+
+
+def solve_2_rowwise(tractor_beam, dimension):
     boundaries = {}
     counter = 100
     for counter in count(100):
@@ -326,11 +340,41 @@ def solve_2(tractor_beam, dimension):
 def main():
     import time
     start = time.time()
-    comp = Computer(filename)
-    tractor_beam = TractorBeam(filename)
-    print(solve_1(tractor_beam, 50))
-    print(solve_2(tractor_beam, 100))
+    args = sys.argv[1:]
+    # 'scan' (one NumPy batch) or 'grid' (one batch of probes through the
+    # cache) checks part 1 against probing the whole area. 'rowwise' walks
+    # down the rows one at a time for part 2, for comparison.
+    modes = ('scan', 'grid', 'rowwise')
+    mode = args.pop(0) if args and args[0] in modes else None
+    # An optional argument names a file to keep probe results in between
+    # runs.
+    store = args[0] if args else None
+    executor = None
+    if (os.cpu_count() or 1) > 1:
+        executor = worker_pool(Computer.from_filename(filename).program)
+    tractor_beam = TractorBeam(filename, store, executor)
+    part_1 = solve_1(tractor_beam, 50)
+    if mode in ('scan', 'grid'):
+        if mode == 'scan':
+            scanned = int(tractor_beam.scan(50, 50).sum())
+        else:
+            scanned = solve_1_grid(tractor_beam, 50)
+        if scanned != part_1:
+            raise ValueError("Scan found {} squares, solve_1 {}".format(
+                scanned, part_1))
+    print(part_1)
+    if mode == 'rowwise':
+        print(solve_2_rowwise(tractor_beam, 100))
+    else:
+        print(solve_2(tractor_beam, 100))
+    tractor_beam.cache.close()
+    if executor is not None:
+        executor.shutdown()
     print("elapsed: {:.2f}s".format(time.time() - start))
+    print("{} probes: {hits} cached, {disk_hits} from disk, {misses} run"
+          .format(tractor_beam.calls, **tractor_beam.cache.stats()),
+          file=sys.stderr)
 
 
-main()
+if __name__ == "__main__":
+    main()
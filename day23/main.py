@@ -1,271 +1,220 @@
-from collections import defaultdict, deque
-
-
-class HaltedError(Exception):
-    pass
-
-
-class Computer:
-    OPERATIONS = {
-        1: 'add',
-        2: 'mul',
-        3: 'use_input',
-        4: 'ret_output',
-        5: 'jump_if_true',
-        6: 'jump_if_false',
-        7: 'less_than',
-        8: 'equals',
-        9: 'offset_rel_base',
-        99: 'halt'
-    }
-
-    GET = 'get'
-    SET = 'set'
-
-    OP_SIGNATURES = {
-        'add': (GET, GET, SET),
-        'mul': (GET, GET, SET),
-        'less_than': (GET, GET, SET),
-        'equals': (GET, GET, SET),
-        'jump_if_true': (GET, GET),
-        'jump_if_false': (GET, GET),
-        'offset_rel_base': (GET,),
-        'use_input': (SET,),
-        'ret_output': (GET,),
-        'halt': ()
-    }
-    instruction_pointer = 0
-    relative_base = 0
-    output_val = None
-    input_getter = None
-    halted = True
-    paused = True
-    input_needed = False
-    block_on_input = False
-
-    def __init__(self, filename):
-        self.program = self.load_from_filename(filename)
-        self.memory = list(self.program)
-        self.input_vals = []
-
-    def load_from_filename(self, filename):
-        with open(filename) as f:
-            text = f.read()
-            return tuple(map(int, text.split(',')))
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.relative_base = 0
-        self.parameter_mode = 0
-        self.halted = False
-        self.paused = True
-
-    def get_addr(self, addr):
-        if addr > len(self.memory) - 1:
-            extra = addr - len(self.memory) + 1
-            self.memory.extend([0] * extra)
-        return self.memory[addr]
-
-    def set_addr(self, addr, val):
-        self.memory[addr] = val
-
-    def run(self, input_vals=[]):
-        if self.halted:
-            raise HaltedError
-        if not isinstance(input_vals, (tuple, list)):
-            input_vals = [input_vals]
-        self.input_vals.extend(input_vals)
-        self.paused = False
-        self.needs_input = False
-        while not (self.halted or self.paused):
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        sigs = self.OP_SIGNATURES[self.OPERATIONS[opcode]]
-        if self.need_input(opcode) and self.block_on_input:
-            self.input_needed = True
-            return 1
-        size = len(sigs) + 1
-        params = self.memory[ip + 1:ip + size]
-        self.instruction_pointer += size # gets changed later in jump functions
-        for index in range(len(params)):
-            mode = modes[index]
-            if modes[index] == 2:
-                params[index] += self.relative_base
-
-        dparams = [] # parameters dereferenced according to mode
-        for param, mode in zip(params, modes):
-            if mode in (0, 2):
-                param = self.get_addr(param)
-            dparams.append(param)
-        func = self.get_func_for_opcode(opcode)
-        get_params = [p for p, sig in zip(dparams, sigs) if sig == self.GET]
-        set_params = [p for p, sig in zip(params, sigs) if sig == self.SET]
-        res = func(*get_params)
-        if not isinstance(res, tuple):
-            res = (res,)
-        # If set_params is empty, this does nothing.
-        for set_param, result in zip(set_params, res):
-            self.set_addr(set_param, result)
-
-    def need_input(self, opcode):
-        if self.OPERATIONS[opcode] in ["use_input"]:
-            return not self.input_vals
-
-
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        modes = "{:03d}".format(opcode // 100)
-        modes = tuple(map(int, modes[::-1]))
-        return (normal_opcode, modes)
-
-    def get_func_for_opcode(self, opcode):
-        return getattr(self, self.OPERATIONS[opcode])
-
-    def add(self, x, y):
-        return x + y
-
-    def mul(self, x, y):
-        return x * y
-
-    def less_than(self, x, y):
-        return int(x < y)
-
-    def equals(self, x, y):
-        return int(x == y)
-
-    def use_input(self):
-        if not self.input_vals:
-            return self.input_getter(self)
-        return self.input_vals.pop(0)
-
-    def ret_output(self, x):
-        self.output_val = x
-        self.paused = True
-
-    def jump_if_true(self, x, y):
-        if x:
-            self.instruction_pointer = y
-
-    def jump_if_false(self, x, y):
-        return self.jump_if_true(not(x), y)
-
-    def halt(self):
-        self.halted = True
-
-    def offset_rel_base(self, x):
-        self.relative_base += x
-
-
-def solve_1(fn):
-    comps = []
-    for addr in range(50):
-        comp = Computer(fn)
-        comp.load()
-        comp.packets = deque()
-        comp.input_return_vals = deque()
-        comp.block_on_input = True
-        comp.input_vals = [addr]
-        comps.append(comp)
-
-    queue = defaultdict(list)
-    all_halted = False
-    while not all_halted:
-        all_halted = True
-        for comp_addr, comp in enumerate(comps):
-            if not comp.halted:
-                all_halted = False
-                comp.run()
-            else:
-                continue
-            if comp.paused:
-                # We have output. expect two more
-                address = comp.output_val
-                packet = []
-                for i in range(2):
-                    comp.run()
-                    packet.append(comp.output_val)
-                queue[address].append(packet)
-                if address == 255:
-                    return packet[1]
-            elif comp.input_needed:
-                try:
-                    packet = queue[comp_addr].pop(0)
-                except IndexError:
-                    comp.input_vals.append(-1)
-                else:
-                    comp.input_vals.extend(packet)
-
-
-def solve_2(fn):
-    comps = []
-    for addr in range(50):
-        comp = Computer(fn)
-        comp.load()
-        comp.packets = deque()
-        comp.input_return_vals = deque()
-        comp.block_on_input = True
-        comp.input_vals = [addr]
-        comps.append(comp)
-
-    queue = defaultdict(list)
-    all_halted = False
-    idle_limit = 10
-    nat_val = None
-    idle_counter = 0
+from collections import deque
+from multiprocessing import Pipe, Process
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from intcode import Computer
+
+
+class Network:
+    """
+    The NIC network, scheduled by events instead of round-robin polling.
+
+    Nodes with something to do wait in a ready queue. A node that blocks on
+    input with nothing queued is given one -1; if it then blocks again
+    without sending anything, it is parked until a packet arrives for it.
+    So the network is idle exactly when the ready queue is empty: every
+    node is parked and every input queue is empty. With a ``quantum``, a
+    dispatch is also cut off after that many instructions and the node
+    goes to the back of the ready queue, so no node can hog a round.
+
+    A Network can also hold just a shard of the nodes. Packets for nodes
+    it doesn't hold, and with ``local_nat`` false those for the NAT too,
+    are left in ``outbox`` for whoever routes between shards.
+    """
+
+    def __init__(self, filename, addrs=range(50), local_nat=True,
+                 quantum=None):
+        self.nodes = {}
+        for addr in addrs:
+            comp = Computer.from_filename(filename)
+            comp.block_on_input = True
+            comp.output_sink = deque()
+            comp.input_vals.append(addr)
+            comp.waited = False  # read -1 and has sent nothing since
+            self.nodes[addr] = comp
+        self.ready = deque(addrs)
+        self.parked = set()
+        self.local_nat = local_nat
+        self.quantum = quantum  # instructions per dispatch, if bounded
+        self.outbox = []
+        self.nat = None
+        self.packets = 0
+        self.empty_reads = 0
+        # -1 reads a round-robin pass would have given the parked nodes.
+        self.empty_reads_avoided = 0
+
+    def send(self, addr, x, y):
+        self.packets += 1
+        self.deliver(addr, x, y)
+
+    def deliver(self, addr, x, y):
+        if addr == 255 and self.local_nat:
+            self.nat = (x, y)
+            return
+        if addr not in self.nodes:
+            self.outbox.append((addr, x, y))
+            return
+        node = self.nodes[addr]
+        node.input_vals.extend((x, y))
+        node.waited = False
+        if addr in self.parked:
+            self.parked.remove(addr)
+            self.ready.append(addr)
+
+    def dispatch(self, addr):
+        """Run one node until it blocks, and route what it sent."""
+        node = self.nodes[addr]
+        node.run(max_instructions=self.quantum)
+        sent = node.output_sink
+        if sent:
+            node.waited = False
+        while len(sent) >= 3:
+            self.send(sent.popleft(), sent.popleft(), sent.popleft())
+        if node.halted:
+            return
+        if node.input_vals or node.preempted:
+            self.ready.append(addr)
+        elif node.waited:
+            self.parked.add(addr)
+        else:
+            node.input_vals.append(-1)
+            node.waited = True
+            self.empty_reads += 1
+            self.ready.append(addr)
+
+    def run_round(self):
+        """Dispatch every node that is ready now. Returns False if idle."""
+        if not self.ready:
+            return False
+        for __ in range(len(self.ready)):
+            self.dispatch(self.ready.popleft())
+        self.empty_reads_avoided += len(self.parked)
+        return True
+
+
+def shard_worker(conn, filename, addrs):
+    """
+    Run a shard of the network in a worker process.
+
+    Each round it receives the packets addressed to its nodes, dispatches
+    its ready nodes once, and replies with the packets they sent elsewhere,
+    whether any node is still ready, and how many packets were sent in
+    all. None ends it.
+    """
+    network = Network(filename, addrs, local_nat=False)
+    while 1:
+        inbox = conn.recv()
+        if inbox is None:
+            break
+        for packet in inbox:
+            network.deliver(*packet)
+        network.packets = 0
+        network.run_round()
+        conn.send((network.outbox, bool(network.ready), network.packets))
+        network.outbox = []
+    conn.close()
+
+
+def solve_1(network):
+    while network.nat is None:
+        if not network.run_round():
+            raise RuntimeError("Network went idle before using the NAT")
+    return network.nat[1]
+
+
+def solve_2(network):
+    last_y = None
+    while 1:
+        while network.run_round():
+            pass
+        x, y = network.nat
+        if y == last_y:
+            return y
+        last_y = y
+        network.send(0, x, y)
+
+
+def solve_2_sharded(filename, workers, size=50):
+    """
+    solve_2 with the nodes sharded over worker processes.
+
+    The NAT and the routing between shards stay in this process. Rounds
+    are synchronous: every shard runs one round, then the packets that
+    crossed shards are delivered, so idleness is still exact. Returns
+    (answer, packets sent).
+    """
+    shards = [range(size)[i::workers] for i in range(workers)]
+    owner = {addr: i for i, shard in enumerate(shards) for addr in shard}
+    conns = []
+    processes = []
+    for shard in shards:
+        conn, child_conn = Pipe()
+        process = Process(target=shard_worker,
+                          args=(child_conn, filename, shard))
+        process.start()
+        conns.append(conn)
+        processes.append(process)
+
+    inboxes = [[] for __ in shards]
+    nat = None
     last_y = None
-    while not all_halted:
-        all_halted = True
-        have_output = False
-        for comp_addr, comp in enumerate(comps):
-            if not comp.halted:
-                all_halted = False
-                comp.run()
-            else:
+    packets = 0
+    try:
+        while 1:
+            for conn, inbox in zip(conns, inboxes):
+                conn.send(inbox)
+            inboxes = [[] for __ in shards]
+            busy = False
+            for conn in conns:
+                outbox, ready, sent = conn.recv()
+                busy = busy or ready
+                packets += sent
+                for addr, x, y in outbox:
+                    if addr == 255:
+                        nat = (x, y)
+                    else:
+                        inboxes[owner[addr]].append((addr, x, y))
+            if busy or any(inboxes):
                 continue
-            if comp.paused:
-                # We have output. expect two more
-                address = comp.output_val
-                have_output = True
-                packet = []
-                for i in range(2):
-                    comp.run()
-                    packet.append(comp.output_val)
-                queue[address].append(packet)
-                if address == 255:
-                    nat_val = packet
-            elif comp.input_needed:
-                try:
-                    packet = queue[comp_addr].pop(0)
-                except IndexError:
-                    comp.input_vals.append(-1)
-                else:
-                    comp.input_vals.extend(packet)
-        if have_output:
-            idle_counter = 0
-        else:
-            idle_counter += 1
-        if idle_counter >= idle_limit:
-            queue[0].append(nat_val)
-            if nat_val[1] == last_y:
-                return last_y
-            else:
-                last_y = nat_val[1]
-            idle_counter = 0
-
-
+            x, y = nat
+            if y == last_y:
+                return y, packets
+            last_y = y
+            inboxes[owner[0]].append((0, x, y))
+            packets += 1
+    finally:
+        for conn in conns:
+            try:
+                conn.send(None)
+            except BrokenPipeError:
+                pass  # that worker has already died
+        for process in processes:
+            process.join()
 
 
 def main():
     filename = "input.txt"
-    print(solve_1(filename))
-    print(solve_2(filename))
+    for solve in (solve_1, solve_2):
+        network = Network(filename)
+        start = time.perf_counter()
+        print(solve(network))
+        elapsed = time.perf_counter() - start
+        print("{:,.0f} packets/s, {:,} -1 reads, {:,} avoided".format(
+            network.packets / elapsed, network.empty_reads,
+            network.empty_reads_avoided), file=sys.stderr)
+    workers = os.cpu_count() or 1
+    if workers > 1:
+        start = time.perf_counter()
+        answer, packets = solve_2_sharded(filename, workers)
+        elapsed = time.perf_counter() - start
+        assert answer == network.nat[1]
+        print("sharded over {} processes: {:,.0f} packets/s".format(
+            workers, packets / elapsed), file=sys.stderr)
 
 
 if __name__ == "__main__":
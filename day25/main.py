@@ -1,182 +1,199 @@
-class HaltedError(Exception):
-    pass
-
-
-class Computer:
-    OPERATIONS = {
-        1: 'add',
-        2: 'mul',
-        3: 'use_input',
-        4: 'ret_output',
-        5: 'jump_if_true',
-        6: 'jump_if_false',
-        7: 'less_than',
-        8: 'equals',
-        9: 'offset_rel_base',
-        99: 'halt'
-    }
-
-    GET = 'get'
-    SET = 'set'
-
-    OP_SIGNATURES = {
-        'add': (GET, GET, SET),
-        'mul': (GET, GET, SET),
-        'less_than': (GET, GET, SET),
-        'equals': (GET, GET, SET),
-        'jump_if_true': (GET, GET),
-        'jump_if_false': (GET, GET),
-        'offset_rel_base': (GET,),
-        'use_input': (SET,),
-        'ret_output': (GET,),
-        'halt': ()
-    }
-    instruction_pointer = 0
-    relative_base = 0
-    output_val = None
-    input_getter = None
-    halted = True
-    paused = True
-    input_needed = False
-    block_on_input = False
-
-    def __init__(self, filename):
-        self.program = self.load_from_filename(filename)
-        self.memory = list(self.program)
-        self.input_vals = []
-
-    def load_from_filename(self, filename):
-        with open(filename) as f:
-            text = f.read()
-            return tuple(map(int, text.split(',')))
-
-    def load(self):
-        self.memory = list(self.program)
-        self.instruction_pointer = 0
-        self.relative_base = 0
-        self.parameter_mode = 0
-        self.halted = False
-        self.paused = True
-
-    def get_addr(self, addr):
-        if addr > len(self.memory) - 1:
-            extra = addr - len(self.memory) + 1
-            self.memory.extend([0] * extra)
-        return self.memory[addr]
-
-    def set_addr(self, addr, val):
-        self.memory[addr] = val
-
-    def run(self, input_vals=[]):
-        if self.halted:
-            raise HaltedError
-        if not isinstance(input_vals, (tuple, list)):
-            input_vals = [input_vals]
-        self.input_vals.extend(input_vals)
-        self.paused = False
-        self.needs_input = False
-        while not (self.halted or self.paused):
-            if self.step():
-                break
-        return self.output_val
-
-    def step(self):
-        ip = self.instruction_pointer
-        opcode = self.memory[ip]
-        opcode, modes = self.parse_opcode(opcode)
-        sigs = self.OP_SIGNATURES[self.OPERATIONS[opcode]]
-        if self.need_input(opcode) and self.block_on_input:
-            self.input_needed = True
-            return 1
-        size = len(sigs) + 1
-        params = self.memory[ip + 1:ip + size]
-        self.instruction_pointer += size # gets changed later in jump functions
-        for index in range(len(params)):
-            mode = modes[index]
-            if modes[index] == 2:
-                params[index] += self.relative_base
-
-        dparams = [] # parameters dereferenced according to mode
-        for param, mode in zip(params, modes):
-            if mode in (0, 2):
-                param = self.get_addr(param)
-            dparams.append(param)
-        func = self.get_func_for_opcode(opcode)
-        get_params = [p for p, sig in zip(dparams, sigs) if sig == self.GET]
-        set_params = [p for p, sig in zip(params, sigs) if sig == self.SET]
-        res = func(*get_params)
-        if not isinstance(res, tuple):
-            res = (res,)
-        # If set_params is empty, this does nothing.
-        for set_param, result in zip(set_params, res):
-            self.set_addr(set_param, result)
-
-    def need_input(self, opcode):
-        if self.OPERATIONS[opcode] in ["use_input"]:
-            return not self.input_vals
-
-
-    def parse_opcode(self, opcode):
-        normal_opcode = opcode % 100
-        modes = "{:03d}".format(opcode // 100)
-        modes = tuple(map(int, modes[::-1]))
-        return (normal_opcode, modes)
-
-    def get_func_for_opcode(self, opcode):
-        return getattr(self, self.OPERATIONS[opcode])
-
-    def add(self, x, y):
-        return x + y
-
-    def mul(self, x, y):
-        return x * y
-
-    def less_than(self, x, y):
-        return int(x < y)
-
-    def equals(self, x, y):
-        return int(x == y)
-
-    def use_input(self):
-        if not self.input_vals:
-            return self.input_getter(self)
-        return self.input_vals.pop(0)
-
-    def ret_output(self, x):
-        self.output_val = x
-        self.paused = True
-
-    def jump_if_true(self, x, y):
-        if x:
-            self.instruction_pointer = y
-
-    def jump_if_false(self, x, y):
-        return self.jump_if_true(not(x), y)
-
-    def halt(self):
-        self.halted = True
-
-    def offset_rel_base(self, x):
-        self.relative_base += x
+from collections import deque, namedtuple
+import asyncio
+import os
+import re
+import sys
+import time
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from intcode import Computer
+from intcode.aio import AsyncComputer
 
-def main():
-    comp = Computer("input.txt")
-    def send_input(data):
-        data = list(map(ord, data)) + [10]
-        comp.input_vals.extend(data)
 
-    comp.block_on_input = True
-    comp.load()
+async def console(comp):
+    """Print the droid's output, and type lines in when it wants input."""
+    loop = asyncio.get_running_loop()
+    machine = asyncio.create_task(comp.run_async())
     while 1:
-        comp.run()
-        if comp.halted:
+        if not comp.outputs.empty():
+            print(chr(comp.outputs.get_nowait()), end='')
+        elif machine.done():
             break
-        elif comp.paused:
-            output = comp.output_val
-            print(chr(output), end='')
-        elif comp.input_needed:
-            send_input(input())
+        elif comp.idle.is_set() and comp.inputs.empty():
+            line = await loop.run_in_executor(None, input)
+            for char in line + '\n':
+                await comp.inputs.put(ord(char))
+        else:
+            idle = asyncio.create_task(comp.idle.wait())
+            await asyncio.wait(
+                [idle, machine], return_when=asyncio.FIRST_COMPLETED)
+            idle.cancel()
+
+
+Room = namedtuple("Room", ("name", "doors", "items"))
+
+
+def parse_room(text):
+    """The last room described in ``text``, or None if there isn't one."""
+    rooms = re.findall(r"== (.+) ==\n(.*?)(?=\n== |\Z)", text, re.S)
+    if not rooms:
+        return None
+    name, body = rooms[-1]
+    lists = {}
+    for heading, entries in re.findall(
+            r"^(Doors here lead|Items here):\n((?:- .*\n?)+)", body, re.M):
+        lists[heading] = [line[2:] for line in entries.splitlines()]
+    return Room(name, lists.get("Doors here lead", []),
+                lists.get("Items here", []))
+
+
+class Droid(Computer):
+    """
+    The droid's computer, driven one command at a time.
+
+    Output is collected in a sink and returned as text when the droid next
+    asks for a command. A command that doesn't get back to the prompt
+    within BUDGET instructions (some items trap the program in a loop)
+    gives None.
+    """
+    BUDGET = 10 ** 5
+
+    def __init__(self, program):
+        super().__init__(program)
+        self.block_on_input = True
+        self.output_sink = deque()
+
+    def command(self, line=None):
+        if line is not None:
+            self.write_text(line + '\n')
+        self.run(max_instructions=self.BUDGET)
+        if self.preempted:
+            self.output_sink.clear()
+            return None
+        return self.read_all().decode()
+
+
+class ShipExplorer:
+    """
+    Finds the password without typing a thing.
+
+    The ship is mapped depth first, forking a snapshot in every room
+    rather than walking back. Each item is tried out from its room's
+    snapshot and kept only if the droid can still move afterwards. The
+    droid then collects every safe item, walks to the security
+    checkpoint and tries inventories in Gray code order, so each attempt
+    drops or takes just one item.
+    """
+
+    def __init__(self, droid):
+        self.droid = droid
+        self.rooms = {}  # name -> Room
+        self.snapshots = {}  # name -> Snapshot of the droid just arrived
+        self.exits = {}  # name -> {door: name}
+        self.checkpoint = None
+        self.floor_door = None
+
+    def explore(self):
+        room = parse_room(self.droid.command())
+        self.start = room.name
+        self.visit(room)
+
+    def visit(self, room):
+        droid = self.droid
+        self.rooms[room.name] = room
+        self.snapshots[room.name] = snap = droid.snapshot()
+        self.exits[room.name] = exits = {}
+        for door in room.doors:
+            droid.restore(snap)
+            text = droid.command(door)
+            if "Alert!" in text:
+                # Thrown back: the next room weighs the droid.
+                self.checkpoint = room.name
+                self.floor_door = door
+                continue
+            there = parse_room(text)
+            exits[door] = there.name
+            if there.name not in self.rooms:
+                self.visit(there)
+
+    def is_safe(self, room, item):
+        droid = self.droid
+        droid.restore(self.snapshots[room.name])
+        text = droid.command("take " + item)
+        if text is None or droid.halted:
+            return False
+        text = droid.command(room.doors[0])
+        return not (text is None or droid.halted or "can't move" in text)
+
+    def route(self, start, goal):
+        """The doors to take from start to goal, by BFS on the map."""
+        paths = {start: []}
+        queue = deque([start])
+        while queue:
+            here = queue.popleft()
+            if here == goal:
+                return paths[here]
+            for door, there in self.exits[here].items():
+                if there not in paths:
+                    paths[there] = paths[here] + [door]
+                    queue.append(there)
+        raise ValueError("No way from {} to {}".format(start, goal))
+
+    def collect(self):
+        """Walk round taking every safe item. Returns them."""
+        safe = [(room, item) for room in self.rooms.values()
+                for item in room.items if self.is_safe(room, item)]
+        droid = self.droid
+        droid.restore(self.snapshots[self.start])
+        here = self.start
+        for room, item in safe:
+            for door in self.route(here, room.name):
+                droid.command(door)
+            droid.command("take " + item)
+            here = room.name
+        for door in self.route(here, self.checkpoint):
+            droid.command(door)
+        return [item for __, item in safe]
+
+    def find_password(self):
+        """Try inventories at the checkpoint until one gets through."""
+        self.explore()
+        items = self.collect()
+        droid = self.droid
+        snap = droid.snapshot()
+        held = 0  # bit i set: items[i] has been dropped
+        for attempt in range(1 << len(items)):
+            gray = attempt ^ (attempt >> 1)
+            changed = gray ^ held
+            # One bit apart, except after a restore to holding everything.
+            for i, item in enumerate(items):
+                if changed >> i & 1:
+                    verb = "drop " if gray >> i & 1 else "take "
+                    droid.command(verb + item)
+            held = gray
+            text = droid.command(self.floor_door)
+            password = re.search(r"(\d+) on the keypad", text or '')
+            if password:
+                return password.group(1)
+            if text is None or droid.halted:
+                droid.restore(snap)
+                held = 0
+        raise ValueError("No inventory gets past the checkpoint")
+
+
+def main():
+    if sys.argv[1:] == ['play']:
+        comp = AsyncComputer.from_filename("input.txt")
+        asyncio.run(console(comp))
+        return
+    start = time.perf_counter()
+    droid = Droid.from_filename("input.txt")
+    print(ShipExplorer(droid).find_password())
+    elapsed = time.perf_counter() - start
+    print("{:,} instructions, {:.2f}s elapsed".format(
+        droid.instructions, elapsed), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+"""
+The Intcode machine shared by every day that runs an Intcode program.
+
+The day scripts live in their own directories and are run from there, so
+they put the repository root on ``sys.path`` before importing this package.
+"""
+from .compiler import CompiledComputer
+from .computer import Computer, HaltedError, NoInputError, Snapshot
+
+__all__ = ['CompiledComputer', 'Computer', 'HaltedError', 'NoInputError',
+           'Snapshot']
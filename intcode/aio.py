@@ -0,0 +1,56 @@
+"""
+An asyncio Intcode machine with awaitable input and output channels.
+
+Instead of the pause/resume protocol, an AsyncComputer's input instruction
+awaits its ``inputs`` channel and its output instruction puts to its
+``outputs`` channel, so the code driving it can be an ordinary coroutine.
+Channels are ``asyncio.Queue`` objects by default; anything with the same
+``get``/``put``/``get_nowait``/``empty`` methods will do.
+"""
+import asyncio
+from collections import deque
+
+from .computer import Computer, HaltedError
+
+
+class AsyncComputer(Computer):
+    """
+    A Computer run as a coroutine with ``await comp.run_async()``.
+
+    It runs at most QUANTUM instructions per event loop turn, then yields,
+    so many machines share one thread fairly. Outputs are collected during
+    a slice and put to ``outputs`` at the end of it, waiting if that
+    channel is full. ``idle`` is set while the machine waits on an empty
+    ``inputs`` channel.
+    """
+    QUANTUM = 2000
+
+    def __init__(self, program, inputs=None, outputs=None):
+        super().__init__(program)
+        self.inputs = asyncio.Queue() if inputs is None else inputs
+        self.outputs = asyncio.Queue() if outputs is None else outputs
+        self.idle = asyncio.Event()
+        self.block_on_input = True
+        self.output_sink = deque()
+
+    async def run_async(self, input_vals=()):
+        """Run until the program halts."""
+        if self.halted:
+            raise HaltedError
+        self.input_vals.extend(input_vals)
+        while True:
+            self.run(max_instructions=self.QUANTUM)
+            while self.output_sink:
+                await self.outputs.put(self.output_sink.popleft())
+            if self.halted:
+                return
+            if self.input_needed:
+                self.idle.set()
+                try:
+                    self.input_vals.append(await self.inputs.get())
+                finally:
+                    self.idle.clear()
+                while not self.inputs.empty():
+                    self.input_vals.append(self.inputs.get_nowait())
+            else:
+                await asyncio.sleep(0)
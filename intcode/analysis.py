@@ -0,0 +1,593 @@
+"""
+Static analysis of Intcode programs: disassembly, basic blocks and a
+control-flow graph.
+
+``Analysis(program)`` decodes the program by following control flow from
+address 0 with the same OPERATIONS and OP_SIGNATURES tables the machine
+runs on, so the data that most programs keep after their code is never
+mistaken for instructions. Along the way it recognises the calling
+convention the puzzle programs are compiled with: a caller leaves its
+return address at ``[rb+0]`` with an immediate ``add`` or ``mul`` and
+jumps unconditionally to the function, which moves rb with ``109`` and
+returns with an unconditional jump to ``[rb+0]``. Calls get an edge to the
+function and one to the return site, and each function's returns get an
+edge back to every return site of a call to it. Functions only called
+through pointers are found from constants, stored or in data, that point
+at a ``109`` followed by code that decodes; jump tables, indexed by
+patching the target parameter of a jump, are read for as long as they
+hold addresses of code.
+
+Writes whose constant address lands on a decoded instruction are marked as
+self-modifying stores. The words they target are ``volatile`` in the sense
+of ``compiler.compile_block``. Other jumps to a computed address are
+``indirect``: the code they reach is only found if something else reaches
+it too. Neither is an instruction whose opcode is patched before it runs,
+like the one at address 6 in day05's program.
+
+Run from the repository root with ``python -m intcode.analysis [DAY|FILE
+...]`` for a summary of every Intcode program in the repository, adding
+``--listing`` for the disassembly, ``--dot FILE`` for a Graphviz graph or
+``--json FILE`` for the graph as JSON.
+"""
+from collections import namedtuple
+import argparse
+import json
+import sys
+import time
+
+from .bench import load_program
+from .computer import Computer
+
+INTCODE_DAYS = (2, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25)
+
+# Edge kinds. ``after_call`` joins a call to its return site, so a
+# function's graph can be walked without going through its callees.
+FALL = 'fall'
+BRANCH = 'branch'
+JUMP = 'jump'
+CALL = 'call'
+AFTER_CALL = 'after_call'
+RETURN = 'return'
+TABLE = 'table'
+
+# opcode -> index of the parameter it writes to, if any
+WRITES = {}
+for _opcode, _name in Computer.OPERATIONS.items():
+    for _index, _sig in enumerate(Computer.OP_SIGNATURES[_name]):
+        if _sig == Computer.SET:
+            WRITES[_opcode] = _index
+
+
+class Op(namedtuple("Op", ("addr", "opcode", "modes", "params"))):
+    """One decoded instruction, with only the modes it uses."""
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return Computer.OPERATIONS[self.opcode]
+
+    @property
+    def next(self):
+        return self.addr + len(self.params) + 1
+
+    def operands(self):
+        """The parameters as text: ``5``, ``[5]`` or ``[rb+5]``."""
+        text = []
+        for mode, param in zip(self.modes, self.params):
+            if mode == 1:
+                text.append(str(param))
+            elif mode == 0:
+                text.append('[{}]'.format(param))
+            else:
+                text.append('[rb{:+d}]'.format(param))
+        return text
+
+    def __str__(self):
+        return "{:>6}  {:<15} {}".format(
+            self.addr, self.name, ', '.join(self.operands())).rstrip()
+
+
+def decode(program, addr):
+    """The Op at ``addr`` in ``program``, or None if there isn't one."""
+    if not 0 <= addr < len(program):
+        return None
+    word = program[addr]
+    name = Computer.OPERATIONS.get(word % 100) if word > 0 else None
+    if name is None:
+        return None
+    size = len(Computer.OP_SIGNATURES[name])
+    modes = (word // 100 % 10, word // 1000 % 10, word // 10000)[:size]
+    if addr + size >= len(program) or any(mode > 2 for mode in modes):
+        return None
+    return Op(addr, word % 100, modes, program[addr + 1:addr + size + 1])
+
+
+def always_jumps(op):
+    """Whether ``op`` is a jump on a constant condition that holds."""
+    return (op.opcode in (5, 6) and op.modes[0] == 1
+            and (op.params[0] != 0) == (op.opcode == 5))
+
+
+class Block:
+    """A basic block: ops run in order, entered only at ``start``."""
+
+    def __init__(self, ops):
+        self.ops = ops
+        self.succ = []  # (address, edge kind) pairs
+        self.pred = []  # (address, edge kind) pairs
+        self.functions = []  # entries of the functions it belongs to
+
+    @property
+    def start(self):
+        return self.ops[0].addr
+
+    @property
+    def end(self):
+        return self.ops[-1].next
+
+
+class Function:
+    """The blocks reachable from a call target without following calls."""
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.blocks = []
+        self.returns = []  # blocks that end in a return
+        self.calls = []  # entries of the functions it calls
+        self.frame = None  # rb adjustment on entry, if it makes one
+
+
+class Analysis:
+    """
+    The control-flow graph of ``program`` as decoded from ``entry``.
+
+    ``ops`` maps every decoded address to its Op and ``blocks`` every
+    block start to its Block. ``calls`` maps the address of each call's
+    jump to its (function, return site) pair, with None for the function
+    of a call through a pointer, and ``functions`` each entry to its
+    Function, with the program's entry among them. ``tables`` maps jumps
+    through a table to its targets. ``stores`` maps self-modifying
+    stores to the address they write, all of which are in ``volatile``;
+    ``indirect`` holds the computed jumps that aren't returns or tables
+    and ``bad`` the addresses control reaches with no valid instruction
+    there.
+    """
+
+    def __init__(self, program, entry=0):
+        self.program = tuple(program)
+        self.entry = entry
+        self.ops = {}
+        self.blocks = {}
+        self.functions = {}
+        self.calls = {}
+        self.returns = set()
+        self.indirect = set()
+        self.tables = {}
+        self.pointers = set()
+        self.bad = set()
+        self.stores = {}
+        self.volatile = set()
+        self._exits = {}  # address of an op that ends a block -> edges
+        leaders = self._discover()
+        self._find_stores()
+        self._build_blocks(leaders)
+        self._build_functions()
+
+    def _discover(self):
+        """Decode every op reachable from the entry; return block leaders."""
+        leaders = {self.entry}
+        work = [self.entry]
+        while work:
+            addr = work.pop()
+            run = []  # ops decoded in a straight line from addr
+            while addr not in self.ops:
+                op = decode(self.program, addr)
+                if op is None:
+                    self.bad.add(addr)
+                    break
+                self.ops[addr] = op
+                run.append(op)
+                pointer = self._pointer(op)
+                if pointer is not None and pointer not in leaders:
+                    self.pointers.add(pointer)
+                    leaders.add(pointer)
+                    work.append(pointer)
+                edges = self._edges(op, run)
+                if edges is None:
+                    addr = op.next
+                    continue
+                for target, __ in edges:
+                    if target not in leaders:
+                        leaders.add(target)
+                        work.append(target)
+                break
+            else:
+                leaders.add(addr)
+            if not work:
+                work = self._data_pointers(leaders)
+        return leaders & self.ops.keys()
+
+    def _pointer(self, op):
+        """
+        The function ``op`` stores a pointer to, if it stores a constant
+        that is the address of a ``109`` prologue.
+        """
+        if op.opcode not in (1, 2) or op.modes[:2] != (1, 1):
+            return None
+        a, b = op.params[:2]
+        value = a + b if op.opcode == 1 else a * b
+        return value if self._prologue(value) else None
+
+    def _prologue(self, addr):
+        """
+        Whether a function could start at ``addr``: with a ``109``, and
+        with straight-line code from there that decodes up to the first
+        unconditional jump or halt, which text rarely does.
+        """
+        if not 0 <= addr < len(self.program) or self.program[addr] != 109:
+            return False
+        while True:
+            op = decode(self.program, addr)
+            if op is None:
+                return False
+            if op.opcode == 99 or always_jumps(op):
+                return True
+            addr = op.next
+
+    def _data_pointers(self, leaders):
+        """
+        Prologues pointed at from words outside the code decoded so far,
+        for programs that keep function pointers in tables.
+        """
+        code = set()
+        for op in self.ops.values():
+            code.update(range(op.addr, op.next))
+        candidates = {addr for addr, word in enumerate(self.program)
+                      if word == 109} - code - leaders
+        found = []
+        for addr, value in enumerate(self.program):
+            if (value in candidates and addr not in code
+                    and self._prologue(value)):
+                candidates.discard(value)
+                self.pointers.add(value)
+                leaders.add(value)
+                found.append(value)
+        return found
+
+    def _edges(self, op, run):
+        """
+        The edges out of ``op`` if it ends a block, or None if it doesn't.
+        ``run`` is the straight line of ops leading up to it.
+        """
+        if op.opcode == 99:
+            edges = []
+        elif op.opcode in (5, 6):
+            cond, target = op.params
+            known = op.modes[1] == 1
+            if op.modes[0] == 1:
+                if (cond != 0) != (op.opcode == 5):
+                    return None  # never taken
+                site = self._return_site(run)
+                if site is not None and known:
+                    self.calls[op.addr] = (target, site)
+                    edges = [(target, CALL), (site, AFTER_CALL)]
+                elif site is not None:
+                    # A call through a function pointer.
+                    self.calls[op.addr] = (None, site)
+                    self.indirect.add(op.addr)
+                    edges = [(site, AFTER_CALL)]
+                elif known:
+                    edges = [(target, JUMP)]
+                elif op.modes[1] == 2 and target == 0:
+                    self.returns.add(op.addr)
+                    edges = []
+                else:
+                    targets = self._table(run)
+                    if targets:
+                        self.tables[op.addr] = targets
+                    else:
+                        self.indirect.add(op.addr)
+                    edges = [(addr, TABLE) for addr in targets or ()]
+            else:
+                if known:
+                    edges = [(target, BRANCH)]
+                else:
+                    self.indirect.add(op.addr)
+                    edges = []
+                edges.append((op.next, FALL))
+        else:
+            return None
+        self._exits[op.addr] = edges
+        return edges
+
+    def _return_site(self, run):
+        """
+        The address the ops in ``run`` leave at ``[rb+0]`` for the
+        unconditional jump that ends it, if they leave a constant one.
+        """
+        delta = 0  # how far rb moves between an op and the jump
+        for op in reversed(run[:-1]):
+            if op.opcode == 9:
+                if op.modes[0] != 1:
+                    return None
+                delta += op.params[0]
+                continue
+            index = WRITES.get(op.opcode)
+            if (index is None or op.modes[index] != 2
+                    or op.params[index] != delta):
+                continue
+            if op.opcode not in (1, 2) or op.modes[:2] != (1, 1):
+                return None
+            a, b = op.params[:2]
+            site = a + b if op.opcode == 1 else a * b
+            return site if 0 <= site < len(self.program) else None
+        return None
+
+    def _table(self, run):
+        """
+        The targets of the jump table indexed by the unconditional jump
+        that ends ``run``, if the ops before it point the jump's target
+        parameter at ``[base + index]``. The table is read from ``base``
+        for as long as it holds addresses of code beyond itself.
+        """
+        jump = run[-1]
+        if jump.modes[1] != 0:
+            return None
+        for op in reversed(run[:-1]):
+            index = WRITES.get(op.opcode)
+            if (index is None or op.modes[index] != 0
+                    or op.params[index] != jump.addr + 2):
+                continue
+            if op.opcode != 1 or sorted(op.modes[:2]) != [0, 1]:
+                return None
+            base = op.params[op.modes.index(1)]
+            targets = []
+            for addr in range(base, len(self.program)):
+                target = self.program[addr]
+                if target <= addr or decode(self.program, target) is None:
+                    break
+                targets.append(target)
+            return targets
+        return None
+
+    def _find_stores(self):
+        code = set()
+        for op in self.ops.values():
+            code.update(range(op.addr, op.next))
+        for op in self.ops.values():
+            index = WRITES.get(op.opcode)
+            if (index is not None and op.modes[index] == 0
+                    and op.params[index] in code):
+                self.stores[op.addr] = op.params[index]
+        # A store whose address another store patches in writes somewhere
+        # that isn't known here.
+        patchers = {}  # address -> stores that write it
+        for addr, target in self.stores.items():
+            patchers.setdefault(target, set()).add(addr)
+        for addr in list(self.stores):
+            word = addr + 1 + WRITES[self.ops[addr].opcode]
+            if patchers.get(word, set()) - {addr}:
+                del self.stores[addr]
+        self.volatile.update(self.stores.values())
+
+    def _build_blocks(self, leaders):
+        for start in sorted(leaders):
+            ops = []
+            addr = start
+            while True:
+                op = self.ops[addr]
+                ops.append(op)
+                if addr in self._exits:
+                    edges = self._exits[addr]
+                    break
+                addr = op.next
+                if addr in leaders or addr not in self.ops:
+                    edges = [(addr, FALL)] if addr in self.ops else []
+                    break
+            block = self.blocks[start] = Block(ops)
+            block.succ.extend(edges)
+        for start, block in self.blocks.items():
+            for target, kind in block.succ:
+                if target in self.blocks:
+                    self.blocks[target].pred.append((start, kind))
+
+    def _build_functions(self):
+        entries = {self.entry}
+        entries.update(target for target, __ in self.calls.values())
+        # A constant that looks like a pointer to code the program also
+        # runs into is taken to be something else.
+        entries.update(
+            addr for addr in self.pointers if addr in self.blocks and all(
+                kind in (CALL, TABLE) for __, kind in self.blocks[addr].pred))
+        for entry in sorted(entries & self.blocks.keys()):
+            function = self.functions[entry] = Function(entry)
+            first = self.ops[entry]
+            if first.opcode == 9 and first.modes[0] == 1:
+                function.frame = first.params[0]
+            seen = {entry}
+            work = [entry]
+            while work:
+                block = self.blocks[work.pop()]
+                function.blocks.append(block.start)
+                block.functions.append(entry)
+                last = block.ops[-1].addr
+                if last in self.returns:
+                    function.returns.append(block.start)
+                for target, kind in block.succ:
+                    if kind == CALL:
+                        if target not in function.calls:
+                            function.calls.append(target)
+                    elif target not in seen and target in self.blocks:
+                        seen.add(target)
+                        work.append(target)
+            function.blocks.sort()
+            function.returns.sort()
+            function.calls.sort()
+        for addr, (target, site) in self.calls.items():
+            function = self.functions.get(target)
+            for start in function.returns if function else ():
+                self.blocks[start].succ.append((site, RETURN))
+                self.blocks[site].pred.append((start, RETURN))
+
+    def block_at(self, addr):
+        """The block containing the op at ``addr``, or None."""
+        for block in self.blocks.values():
+            if block.start <= addr < block.end:
+                return block
+        return None
+
+    def annotation(self, op):
+        """Notes on ``op`` for the listing, or an empty string."""
+        notes = []
+        if op.addr in self.calls:
+            target, site = self.calls[op.addr]
+            notes.append('call {}, returns to {}'.format(
+                'through pointer' if target is None else target, site))
+        elif op.addr in self.tables:
+            notes.append('jump table of {}'.format(len(self.tables[op.addr])))
+        elif op.addr in self.returns:
+            notes.append('return')
+        elif op.addr in self.indirect:
+            notes.append('indirect jump')
+        if op.addr in self.stores:
+            notes.append('patches {}'.format(self.stores[op.addr]))
+        patched = [addr for addr in range(op.addr, op.next)
+                   if addr in self.volatile]
+        if patched:
+            notes.append('patched at {}'.format(
+                ', '.join(map(str, patched))))
+        return '; '.join(notes)
+
+    def listing(self):
+        """The disassembly as lines of text, block by block."""
+        lines = []
+        last_end = 0
+        for start in sorted(self.blocks):
+            block = self.blocks[start]
+            if start > last_end:
+                lines.append('        ; {} words not reached'.format(
+                    start - last_end))
+            last_end = max(last_end, block.end)
+            if start in self.functions:
+                function = self.functions[start]
+                lines.append('')
+                lines.append('function {}{}'.format(start, ''.join(
+                    ', {} {}'.format(label, value) for label, value in (
+                        ('frame', function.frame),
+                        ('calls', ' '.join(map(str, function.calls))))
+                    if value)))
+            lines.append('block {}{}'.format(start, ''.join(
+                ' <- {} {}'.format(kind, addr)
+                for addr, kind in block.pred)))
+            for op in block.ops:
+                note = self.annotation(op)
+                lines.append('{:<40}  ; {}'.format(str(op), note)
+                             if note else str(op))
+            for addr, kind in block.succ:
+                lines.append('        -> {} {}'.format(kind, addr))
+        if last_end < len(self.program):
+            lines.append('        ; {} words not reached'.format(
+                len(self.program) - last_end))
+        return lines
+
+    def as_dict(self):
+        return {
+            'size': len(self.program),
+            'entry': self.entry,
+            'blocks': [{
+                'start': block.start,
+                'end': block.end,
+                'ops': len(block.ops),
+                'succ': block.succ,
+                'functions': block.functions,
+            } for __, block in sorted(self.blocks.items())],
+            'functions': [{
+                'entry': function.entry,
+                'frame': function.frame,
+                'blocks': function.blocks,
+                'returns': function.returns,
+                'calls': function.calls,
+            } for __, function in sorted(self.functions.items())],
+            'calls': sorted([addr, target, site]
+                            for addr, (target, site) in self.calls.items()),
+            'tables': sorted([addr, targets]
+                             for addr, targets in self.tables.items()),
+            'pointers': sorted(self.pointers),
+            'stores': sorted(self.stores.items()),
+            'volatile': sorted(self.volatile),
+            'indirect': sorted(self.indirect),
+            'bad': sorted(self.bad),
+        }
+
+    def to_dot(self, name='intcode'):
+        """The graph in Graphviz's dot language, one box per block."""
+        styles = {CALL: 'bold', AFTER_CALL: 'dashed', RETURN: 'dotted'}
+        lines = ['digraph "{}" {{'.format(name),
+                 '  node [shape=box, fontname=monospace];']
+        for start, block in sorted(self.blocks.items()):
+            label = ''.join(str(op).strip() + '\\l' for op in block.ops)
+            lines.append('  b{} [label="{}"];'.format(start, label))
+            for target, kind in block.succ:
+                lines.append('  b{} -> b{} [label="{}", style={}];'.format(
+                    start, target, kind, styles.get(kind, 'solid')))
+        lines.append('}')
+        return lines
+
+    def summary(self):
+        coverage = sum(op.next - op.addr for op in self.ops.values())
+        return ("{:,} words, {:,} ops covering {:.0%}, {:,} blocks, "
+                "{:,} functions, {:,} calls, {:,} self-modifying stores, "
+                "{:,} jump tables, {:,} indirect jumps".format(
+                    len(self.program), len(self.ops),
+                    coverage / len(self.program), len(self.blocks),
+                    len(self.functions), len(self.calls), len(self.stores),
+                    len(self.tables), len(self.indirect)))
+
+
+def read_program(arg):
+    """A program given on the command line as a day number or a file."""
+    if arg.isdigit():
+        return load_program(int(arg))
+    with open(arg) as f:
+        return tuple(map(int, f.read().split(',')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('programs', nargs='*', metavar='DAY|FILE',
+                        help="programs to analyse (default: every day's)")
+    parser.add_argument('--listing', action='store_true',
+                        help="print the disassembly")
+    parser.add_argument('--dot', metavar='FILE',
+                        help="write the graph of one program to FILE")
+    parser.add_argument('--json', metavar='FILE',
+                        help="write every graph to FILE as JSON")
+    args = parser.parse_args(argv)
+    names = args.programs or [str(day) for day in INTCODE_DAYS]
+    if args.dot and len(names) != 1:
+        parser.error("--dot takes a single program")
+
+    graphs = {}
+    for name in names:
+        program = read_program(name)
+        start = time.perf_counter()
+        analysis = Analysis(program)
+        elapsed = time.perf_counter() - start
+        label = 'day{:02d}'.format(int(name)) if name.isdigit() else name
+        print("{}: {}".format(label, analysis.summary()))
+        print("{}: analysed in {:.1f} ms".format(label, elapsed * 1000),
+              file=sys.stderr)
+        if args.listing:
+            print('\n'.join(analysis.listing()))
+        if args.dot:
+            with open(args.dot, 'w') as f:
+                f.write('\n'.join(analysis.to_dot(label)) + '\n')
+        graphs[label] = analysis.as_dict()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(graphs, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
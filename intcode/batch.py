@@ -0,0 +1,170 @@
+"""
+Lock-step batched Intcode: one program, many independent inputs.
+
+BatchComputer runs N copies of a program as the rows of one NumPy array,
+one lane per input. Each step gathers the opcode word every running lane is
+at and executes each distinct word once, vectorised over the lanes that are
+on it, so lanes that take different branches are regrouped rather than
+serialised. Lanes halt independently, and each lane's outputs are collected
+in order.
+
+Values are int64, which covers the workloads this is meant for (day02's
+noun/verb grid, day07's phase permutations, day19's beam probes), but not
+programs that overflow it. This module needs NumPy and isn't imported by
+the ``intcode`` package itself.
+"""
+import numpy as np
+
+from .computer import Computer, NoInputError
+
+
+class BatchComputer:
+    """
+    ``lanes`` copies of ``program`` run in lock-step.
+
+    Inputs are given up front to ``run`` as an array with one row per lane,
+    read left to right by that lane's input instructions. ``run`` returns
+    the outputs as a ``(lanes, k)`` array, where k is the largest number of
+    outputs any lane made; ``output_counts`` says how many of each row are
+    real.
+    """
+    GROWTH = Computer.GROWTH
+
+    def __init__(self, program, lanes):
+        self.program = tuple(program)
+        self.lanes = lanes
+        self.instructions = 0
+        self.load()
+
+    @classmethod
+    def from_filename(cls, filename, lanes):
+        with open(filename) as f:
+            return cls(map(int, f.read().split(',')), lanes)
+
+    def load(self):
+        program = np.array(self.program, dtype=np.int64)
+        self.memory = np.tile(program, (self.lanes, 1))
+        self.instruction_pointer = np.zeros(self.lanes, dtype=np.int64)
+        self.relative_base = np.zeros(self.lanes, dtype=np.int64)
+        self.halted = np.zeros(self.lanes, dtype=bool)
+        self.output_counts = np.zeros(self.lanes, dtype=np.int64)
+        self._outputs = []  # (lanes, values) per output instruction
+
+    def get_addr(self, addr):
+        """The word at ``addr`` in every lane."""
+        self._grow(addr)
+        return self.memory[:, addr]
+
+    def set_addr(self, addr, vals):
+        """Set ``addr`` in every lane, to one value or one per lane."""
+        self._grow(addr)
+        self.memory[:, addr] = vals
+
+    def _grow(self, addr):
+        width = self.memory.shape[1]
+        if addr >= width:
+            extra = addr - width + 1
+            extra += -extra % self.GROWTH
+            self.memory = np.pad(self.memory, ((0, 0), (0, extra)))
+
+    def run(self, input_vals=None):
+        """Run every lane to halt and return the outputs."""
+        if input_vals is None:
+            input_vals = np.zeros((self.lanes, 0), dtype=np.int64)
+        input_vals = np.asarray(input_vals, dtype=np.int64).reshape(
+            self.lanes, -1)
+        input_pos = np.zeros(self.lanes, dtype=np.int64)
+        ip = self.instruction_pointer
+        rb = self.relative_base
+
+        while True:
+            running = np.flatnonzero(~self.halted)
+            if not running.size:
+                break
+            ops = self.memory[running, ip[running]]
+            words = np.unique(ops)
+            for op in words.tolist():
+                lanes = running if len(words) == 1 else running[ops == op]
+                self._execute(op, lanes, ip, rb, input_vals, input_pos)
+                self.instructions += len(lanes)
+
+        return self._collect_outputs()
+
+    def _param(self, lanes, addr, mode, rb):
+        """Return the values of a GET parameter, one per lane."""
+        raw = self.memory[lanes, addr]
+        if mode == 1:
+            return raw
+        if mode == 2:
+            raw = raw + rb[lanes]
+        self._check(raw)
+        return self.memory[lanes, raw]
+
+    def _target(self, lanes, addr, mode, rb):
+        """Return the addresses a SET parameter writes to, one per lane."""
+        raw = self.memory[lanes, addr]
+        if mode == 2:
+            raw = raw + rb[lanes]
+        self._check(raw)
+        return raw
+
+    def _check(self, addrs):
+        if addrs.min() < 0:
+            raise ValueError("Negative address {}".format(addrs.min()))
+        self._grow(int(addrs.max()))
+
+    def _execute(self, op, lanes, ip, rb, input_vals, input_pos):
+        """Execute the instruction ``op`` in each of ``lanes``."""
+        code = op % 100
+        m1, m2, m3 = op // 100 % 10, op // 1000 % 10, op // 10000
+        at = ip[lanes]
+        self._grow(int(at.max()) + 3)
+        if code in (1, 2, 7, 8):
+            x = self._param(lanes, at + 1, m1, rb)
+            y = self._param(lanes, at + 2, m2, rb)
+            dst = self._target(lanes, at + 3, m3, rb)
+            if code == 1:
+                res = x + y
+            elif code == 2:
+                res = x * y
+            elif code == 7:
+                res = x < y
+            else:
+                res = x == y
+            self.memory[lanes, dst] = res
+            ip[lanes] = at + 4
+        elif code in (5, 6):
+            x = self._param(lanes, at + 1, m1, rb)
+            y = self._param(lanes, at + 2, m2, rb)
+            taken = (x != 0) if code == 5 else (x == 0)
+            ip[lanes] = np.where(taken, y, at + 3)
+        elif code == 9:
+            rb[lanes] += self._param(lanes, at + 1, m1, rb)
+            ip[lanes] = at + 2
+        elif code == 3:
+            dst = self._target(lanes, at + 1, m1, rb)
+            pos = input_pos[lanes]
+            if pos.max() >= input_vals.shape[1]:
+                raise NoInputError
+            self.memory[lanes, dst] = input_vals[lanes, pos]
+            input_pos[lanes] = pos + 1
+            ip[lanes] = at + 2
+        elif code == 4:
+            x = self._param(lanes, at + 1, m1, rb)
+            self._outputs.append((lanes, x))
+            self.output_counts[lanes] += 1
+            ip[lanes] = at + 2
+        elif code == 99:
+            self.halted[lanes] = True
+        else:
+            raise ValueError("Unknown opcode {} at {}".format(op, int(at[0])))
+
+    def _collect_outputs(self):
+        outputs = np.zeros(
+            (self.lanes, int(self.output_counts.max(initial=0))),
+            dtype=np.int64)
+        filled = np.zeros(self.lanes, dtype=np.int64)
+        for lanes, vals in self._outputs:
+            outputs[lanes, filled[lanes]] = vals
+            filled[lanes] += 1
+        return outputs
@@ -0,0 +1,255 @@
+"""
+Instructions-per-second benchmark for the Intcode machine.
+
+Each workload runs once on the interpreter (Computer) and once in compile
+mode (CompiledComputer). Run from the repository root with
+``python -m intcode.bench``.
+"""
+from itertools import cycle, permutations
+import os
+import time
+
+from .compiler import CompiledComputer
+from .computer import Computer
+
+try:
+    from .batch import BatchComputer
+except ImportError:  # NumPy isn't installed
+    BatchComputer = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_IPS = 2000000
+
+
+def load_program(day):
+    filename = os.path.join(ROOT, 'day{:02d}'.format(day), 'input.txt')
+    with open(filename) as f:
+        return tuple(map(int, f.read().split(',')))
+
+
+def gravity_assist(cls, program):
+    """day02's noun/verb grid: ten thousand tiny reloaded runs."""
+    comp = cls(program)
+    for noun in range(100):
+        for verb in range(100):
+            comp.load()
+            comp.set_addr(1, noun)
+            comp.set_addr(2, verb)
+            comp.run()
+    return [comp]
+
+
+def diagnostic(cls, program):
+    """day05's thermal radiator diagnostic, run a few hundred times."""
+    comp = cls(program)
+    for __ in range(500):
+        comp.load()
+        comp.run_to_halt([5])
+    return [comp]
+
+
+def amplifiers(cls, program):
+    """day07's feedback loop, for every phase permutation."""
+    comps = [cls(program) for __ in range(5)]
+    for perm in permutations(range(5, 10)):
+        for phase, comp in zip(perm, comps):
+            comp.load()
+            comp.input_vals.append(phase)
+        signal = 0
+        for i in cycle(range(5)):
+            signal = comps[i].run([signal])
+            if comps[i].halted and i == 4:
+                break
+    return comps
+
+
+def boost(cls, program):
+    """day09's BOOST sensor mode: one long pure compute run."""
+    comp = cls(program)
+    comp.run_to_halt([2])
+    return [comp]
+
+
+def breakout(cls, program):
+    """day13's game, played to the end by following the ball."""
+    comp = cls(program)
+    comp.set_addr(0, 2)
+    x_of = {3: 0, 4: 0}  # paddle and ball
+
+    def joystick(comp):
+        return (x_of[4] > x_of[3]) - (x_of[4] < x_of[3])
+
+    comp.input_getter = joystick
+    while 1:
+        x = comp.run()
+        if comp.halted:
+            return [comp]
+        comp.run()
+        tile = comp.run()
+        if tile in x_of:
+            x_of[tile] = x
+
+
+def hull_robot(cls, program):
+    """day11's painting robot: a panel in, a colour and a turn out."""
+    comp = cls(program)
+    panels = {}
+    pos, (dx, dy) = (0, 0), (0, -1)
+    while 1:
+        outputs = comp.run_until_outputs(2, [panels.get(pos, 0)])
+        if len(outputs) < 2:
+            return [comp]
+        panels[pos], turn = outputs
+        dx, dy = (dy, -dx) if turn == 0 else (-dy, dx)
+        pos = (pos[0] + dx, pos[1] + dy)
+
+
+def maze(cls, program):
+    """day15's maze, mapped breadth first by forking snapshots."""
+    comp = cls(program)
+    moves = {1: (0, -1), 2: (0, 1), 3: (-1, 0), 4: (1, 0)}
+    seen = {(0, 0)}
+    frontier = [((0, 0), comp.snapshot())]
+    while frontier:
+        new_frontier = []
+        for (x, y), snap in frontier:
+            for move, (dx, dy) in moves.items():
+                pos = (x + dx, y + dy)
+                if pos in seen:
+                    continue
+                seen.add(pos)
+                comp.restore(snap)
+                if comp.run([move]) != 0:
+                    new_frontier.append((pos, comp.snapshot()))
+        frontier = new_frontier
+    return [comp]
+
+
+def camera(cls, program):
+    """day17's scaffold camera: one run printing the whole view."""
+    comp = cls(program)
+    comp.run_to_halt()
+    return [comp]
+
+
+def beam_scan(cls, program):
+    """day19's 50x50 scan: many short runs of a reloaded program."""
+    comp = cls(program)
+    for y in range(50):
+        for x in range(50):
+            comp.load()
+            comp.run([x, y])
+    return [comp]
+
+
+def batch_beam_scan(cls, program):
+    """day19's 50x50 scan as one lock-step batch of 2,500 lanes."""
+    import numpy as np
+    ys, xs = np.mgrid[0:50, 0:50]
+    comp = cls(program, 2500)
+    comp.run(np.stack([xs.ravel(), ys.ravel()], axis=1))
+    return [comp]
+
+
+def network(cls, program):
+    """day23's 50 NICs, until the first packet to address 255."""
+    comps = [cls(program) for __ in range(50)]
+    for addr, comp in enumerate(comps):
+        comp.block_on_input = True
+        comp.input_vals.append(addr)
+    while 1:
+        for comp in comps:
+            comp.run()
+            if comp.input_needed:
+                comp.input_vals.append(-1)
+                continue
+            address = comp.output_val
+            x, y = comp.run(), comp.run()
+            if address == 255:
+                return comps
+            comps[address].input_vals.extend((x, y))
+
+
+def springdroid(cls, program):
+    """day21's walking springscript, run to halt."""
+    script = "NOT A J\nNOT B T\nOR T J\nNOT C T\nOR T J\nAND D J\nWALK\n"
+    comp = cls(program)
+    comp.run_to_halt([ord(c) for c in script])
+    return [comp]
+
+
+def adventure(cls, program):
+    """day25's text adventure, through a few look-around commands."""
+    comp = cls(program)
+    comp.block_on_input = True
+    for command in (None, 'inv', 'north', 'south', 'east', 'west'):
+        if command is not None:
+            comp.input_vals.extend(ord(c) for c in command + '\n')
+        comp.run()
+        while not (comp.input_needed or comp.halted):
+            comp.run()
+        if comp.halted:
+            break
+    return [comp]
+
+
+WORKLOADS = [
+    ('day02 grid', 2, gravity_assist),
+    ('day05 diag', 5, diagnostic),
+    ('day07 feedback', 7, amplifiers),
+    ('day09 boost', 9, boost),
+    ('day11 robot', 11, hull_robot),
+    ('day13 game', 13, breakout),
+    ('day15 maze', 15, maze),
+    ('day17 camera', 17, camera),
+    ('day19 scan', 19, beam_scan),
+    ('day21 walk', 21, springdroid),
+    ('day23 network', 23, network),
+    ('day25 console', 25, adventure),
+]
+
+# The same work done by BatchComputer, where it applies.
+BATCH_WORKLOADS = {
+    beam_scan: batch_beam_scan,
+}
+
+
+def measure(cls, program, workload):
+    start = time.perf_counter()
+    comps = workload(cls, program)
+    elapsed = time.perf_counter() - start
+    return comps, elapsed
+
+
+def report(name, cls, comps, elapsed):
+    count = sum(comp.instructions for comp in comps)
+    print("{:<14} {:<16} {:>11,} instructions {:7.3f}s {:>11,.0f}/s"
+          .format(name, cls.__name__, count, elapsed, count / elapsed))
+
+
+def main():
+    print("target: {:,} instructions/s".format(TARGET_IPS))
+    for name, day, workload in WORKLOADS:
+        program = load_program(day)
+        timings = []
+        for cls in (Computer, CompiledComputer):
+            comps, elapsed = measure(cls, program, workload)
+            timings.append(elapsed)
+            report(name, cls, comps, elapsed)
+            if cls is Computer:
+                stats = comps[0].page_stats()
+        print("{:<14} speedup {:.2f}x".format(name, timings[0] / timings[1]))
+        if workload in BATCH_WORKLOADS and BatchComputer is not None:
+            comps, elapsed = measure(
+                BatchComputer, program, BATCH_WORKLOADS[workload])
+            report(name, BatchComputer, comps, elapsed)
+            print("{:<14} batch speedup {:.2f}x".format(
+                name, timings[0] / elapsed))
+        print("{:<14} pages of {page_size}: {program} program, {grown} grown, "
+              "{sparse} sparse, {dirty} written since load"
+              .format(name, **stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Basic-block compiler for Intcode.
+
+A block is a run of arithmetic, comparison and relative base instructions,
+ended by a conditional or computed jump. Jumps whose outcome is fixed (the
+``1105,1,target`` idiom used for calls and gotos) are followed, so one block
+can span a call into a function body. Each block is translated into Python
+source, compiled once with ``compile``/``exec`` and then executed with a
+single call.
+"""
+from collections import OrderedDict, namedtuple
+from functools import partial
+import sys
+
+from .computer import Computer
+
+MAX_BLOCK = 32
+
+# Instructions a block can contain. 3, 4 and 99 always end a block before
+# them and are left to Computer.step.
+ARITHMETIC = {1: '{} + {}', 2: '{} * {}',
+              7: '1 if {} < {} else 0', 8: '1 if {} == {} else 0'}
+JUMPS = {5: 'if {}:', 6: 'if not {}:'}
+SIZES = {1: 4, 2: 4, 7: 4, 8: 4, 5: 3, 6: 3, 9: 2}
+
+# ``next`` is where execution goes after the instruction if it doesn't
+# leave the block: addr + size, or the target of a fixed jump.
+BlockInstruction = namedtuple(
+    "BlockInstruction", ("addr", "opcode", "modes", "params", "next"))
+
+
+class Block:
+    """A compiled block, made from the words in ``ranges``."""
+
+    def __init__(self, start, ranges, func, size):
+        self.start = start
+        self.ranges = ranges  # (address, words) pairs
+        self.func = func
+        self.size = size
+
+
+def decode_block(memory, start, volatile=frozenset()):
+    """
+    Return the instructions of the block at ``start`` as BlockInstructions.
+
+    ``volatile`` holds addresses the program is known to rewrite. A block
+    never starts or continues at an instruction whose opcode is volatile,
+    and never follows a jump with volatile parameters.
+    """
+    instructions = []
+    ip = start
+    seen = set()
+    while len(instructions) < MAX_BLOCK and 0 <= ip < len(memory):
+        if ip in volatile or ip in seen:
+            break
+        op = memory[ip]
+        code = op % 100
+        modes = (op // 100 % 10, op // 1000 % 10, op // 10000)
+        size = SIZES.get(code)
+        if size is None or ip + size > len(memory):
+            break
+        if code in ARITHMETIC and modes[2] == 1:
+            break
+        params = memory[ip + 1:ip + size]
+        seen.add(ip)
+        fixed = not volatile.intersection(range(ip + 1, ip + size))
+        if code in JUMPS:
+            if not (fixed and modes[0] == 1 and modes[1] == 1):
+                instructions.append(
+                    BlockInstruction(ip, code, modes, params, ip + size))
+                break
+            taken = (params[0] != 0) == (code == 5)
+            nxt = params[1] if taken else ip + size
+        else:
+            nxt = ip + size
+        instructions.append(BlockInstruction(ip, code, modes, params, nxt))
+        ip = nxt
+        if code == 9 and (modes[0] != 1 or not fixed):
+            # rb is no longer known relative to its value on entry.
+            break
+    # Stop after any instruction that rewrites a later part of the block,
+    # unless the word it rewrites is volatile and so read at run time anyway.
+    for index, inst in enumerate(instructions):
+        if (inst.opcode in ARITHMETIC and inst.modes[2] == 0
+                and inst.addr + 3 not in volatile
+                and inst.params[2] not in volatile):
+            target = inst.params[2]
+            for later in instructions[index + 1:]:
+                if later.addr <= target <= later.addr + len(later.params):
+                    del instructions[index + 1:]
+                    break
+    return instructions
+
+
+def compile_block(memory, start, volatile=frozenset()):
+    """
+    Compile the block starting at ``start``, or return None if the
+    instruction there can't begin one.
+
+    Parameters at ``volatile`` addresses are read from memory when the block
+    runs rather than baked in as constants. The generated function takes
+    ``(mem, rb, dirty)``, adds the page of every write to ``dirty``, and
+    returns ``(ip, rb, executed)``. It returns False if any of the other
+    words it was compiled from have changed, and None if a constant or
+    rb-relative address lies past the end of ``mem``; in both cases nothing
+    has been executed. An address read from a volatile word
+    is checked just before its instruction, ending the block early (or
+    returning None if it is the first).
+    """
+    instructions = decode_block(memory, start, volatile)
+    if not instructions:
+        return None
+
+    lines = []
+    guard = []  # checked once on entry
+    checked = []  # checked just before the current instruction
+    late_checks = False
+    rb_delta = 0  # how far rb has moved from its value on entry
+    rel_offsets = []  # constant rb-relative addresses, from the entry rb
+    abs_addrs = []
+    pages = set()  # pages written at constant addresses
+    code_lo = min(inst.addr for inst in instructions)
+    code_hi = max(inst.addr + len(inst.params) + 1 for inst in instructions)
+
+    def address(mode, param_addr):
+        """The address a mode 0 or 2 parameter refers to, as source."""
+        if param_addr in volatile:
+            # Its value may be written earlier in the block, so it can
+            # only be checked just before use.
+            param = 'mem[{}]'.format(param_addr)
+            if mode == 0:
+                checked.append('not 0 <= {} < n'.format(param))
+            else:
+                checked.append('not 0 <= rb + {} < n'.format(param))
+        else:
+            param = memory[param_addr]
+            if mode == 0:
+                abs_addrs.append(param)
+            else:
+                rel_offsets.append(param + rb_delta)
+        if mode == 0:
+            return str(param)
+        return 'rb + {}'.format(param)
+
+    def operand(mode, param_addr):
+        if mode == 1:
+            if param_addr in volatile:
+                return 'mem[{}]'.format(param_addr)
+            return str(memory[param_addr])
+        return 'mem[{}]'.format(address(mode, param_addr))
+
+    def exit_to(target, executed):
+        return 'return ({}, rb, {})'.format(target, executed)
+
+    for executed, inst in enumerate(instructions, 1):
+        addr, code = inst.addr, inst.opcode
+        start_line = len(lines)
+        if code in ARITHMETIC:
+            expr = ARITHMETIC[code].format(
+                operand(inst.modes[0], addr + 1),
+                operand(inst.modes[1], addr + 2))
+            dst = address(inst.modes[2], addr + 3)
+            lines.append('mem[{}] = {}'.format(dst, expr))
+            if dst.isdigit():
+                pages.add(int(dst) >> Computer.PAGE_SHIFT)
+            else:
+                lines.append('dirty.add(({}) >> {})'.format(
+                    dst, Computer.PAGE_SHIFT))
+            if inst.modes[2] == 2 or addr + 3 in volatile:
+                # A computed write could land on this block's own code.
+                lines.append('if {} <= {} < {}:'.format(code_lo, dst, code_hi))
+                lines.append('    ' + exit_to(inst.next, executed))
+        elif code in JUMPS:
+            if executed < len(instructions):
+                continue  # a fixed jump that the block follows
+            lines.append(JUMPS[code].format(operand(inst.modes[0], addr + 1)))
+            target = operand(inst.modes[1], addr + 2)
+            lines.append('    ' + exit_to(target, executed))
+        else:
+            lines.append('rb += {}'.format(operand(inst.modes[0], addr + 1)))
+            rb_delta += inst.params[0]
+        if checked:
+            # Leave before the instruction, or through the step fallback if
+            # it is the first one.
+            leave = exit_to(addr, executed - 1) if executed > 1 else 'return'
+            lines[start_line:start_line] = [
+                'if {}:'.format(' or '.join(checked)), '    ' + leave]
+            late_checks = True
+            del checked[:]
+    lines.append(exit_to(instructions[-1].next, len(instructions)))
+
+    if abs_addrs:
+        guard.append('{} >= n'.format(max(abs_addrs)))
+    if rel_offsets:
+        guard.append('rb + {} >= n'.format(max(rel_offsets)))
+        guard.append('rb + {} < 0'.format(min(rel_offsets)))
+
+    # Compare the words the block was compiled from, skipping volatile ones.
+    words = set()
+    for inst in instructions:
+        words.update(range(inst.addr, inst.addr + len(inst.params) + 1))
+    words -= volatile
+    ranges = []
+    for addr in sorted(words):
+        if ranges and ranges[-1][1] == addr:
+            ranges[-1][1] = addr + 1
+        else:
+            ranges.append([addr, addr + 1])
+    checks = []
+    namespace = {}
+    for lo, hi in ranges:
+        name = 'WORDS_{}'.format(lo)
+        namespace[name] = memory[lo:hi]
+        checks.append('mem[{}:{}] != {}'.format(lo, hi, name))
+
+    source = ['def block(mem, rb, dirty):']
+    source.append('    if {}:'.format(' or '.join(checks)))
+    source.append('        return False')
+    if guard or late_checks:
+        source.append('    n = len(mem)')
+    if guard:
+        source.append('    if {}:'.format(' or '.join(guard)))
+        source.append('        return None')
+    if pages:
+        # Marked up front: a page marked but not written costs only a
+        # redundant copy in load.
+        namespace['PAGES'] = frozenset(pages)
+        source.append('    dirty.update(PAGES)')
+    source.extend('    ' + line for line in lines)
+    code = compile('\n'.join(source), '<intcode block {}>'.format(start),
+                   'exec')
+    exec(code, namespace)
+    ranges = [(lo, memory[lo:hi]) for lo, hi in ranges]
+    return Block(start, ranges, namespace['block'], len(instructions))
+
+
+class CompiledComputer(Computer):
+    """
+    A Computer that runs compiled blocks where it can.
+
+    Blocks are compiled on first entry and kept across ``load`` and across
+    machines running the same program, for the MAX_PROGRAMS programs most
+    recently given to a new machine. When a
+    block finds that one of its words has been overwritten, those addresses
+    are marked volatile and the block is recompiled to read them at run
+    time, so the usual self-modifying idiom of patching an instruction's
+    parameter keeps running compiled. A block rewritten more than
+    REWRITE_LIMIT times is handed to the interpreter for good. Outputs
+    (without an ``output_sink``), halts and inputs that are already queued
+    are handled between blocks; anything else goes through the generic
+    ``step``.
+    """
+    REWRITE_LIMIT = 8
+    MAX_PROGRAMS = 8
+
+    # Entries in _blocks for addresses that don't start a block.
+    STEP = 'step'
+    INTERPRET = 'interpret'
+
+    # Compiled state per program, shared by every machine running it: a
+    # block checks its words on entry, so it is safe in any of them. An
+    # evicted program's state lives on in the machines still using it.
+    _compiled = OrderedDict()
+
+    def __init__(self, program):
+        super().__init__(program)
+        compiled = self._compiled
+        state = compiled.get(self.program)
+        if state is None:
+            state = compiled[self.program] = ({}, {}, set())
+            if len(compiled) > self.MAX_PROGRAMS:
+                compiled.popitem(last=False)
+        else:
+            compiled.move_to_end(self.program)
+        self._blocks, self._rewrites, self._volatile = state
+
+    def watch(self, addrs, callback):
+        # Blocks mark their pages before writing them, too early for the
+        # watchpoints to see the new values, so a watched machine runs the
+        # interpreter's loop instead.
+        self._execute = partial(Computer._execute, self)
+        super().watch(addrs, callback)
+
+    def _execute(self, limit=sys.maxsize):
+        # The limit is checked between blocks, so it can overshoot by up
+        # to MAX_BLOCK instructions.
+        mem = self.memory
+        inputs = self.input_vals
+        blocks = self._blocks
+        dirty = self._dirty
+        ip = self.instruction_pointer
+        rb = self.relative_base
+        count = 0
+        try:
+            while count < limit:
+                block = blocks.get(ip)
+                if block is None:
+                    block = compile_block(mem, ip, self._volatile)
+                    blocks[ip] = block = block or self.STEP
+                if block is self.STEP:
+                    if not 0 <= ip < len(mem) - 1:
+                        break
+                    op = mem[ip]
+                    code = op % 100
+                    if code == 3 and inputs:
+                        dst = mem[ip + 1]
+                        if op // 100 == 2:
+                            dst += rb
+                        if 0 <= dst < len(mem):
+                            mem[dst] = inputs.popleft()
+                            dirty.add(dst >> self.PAGE_SHIFT)
+                            ip += 2
+                            count += 1
+                            continue
+                    elif code == 4 and self.output_sink is None:
+                        x = mem[ip + 1]
+                        if op // 100 == 0 or op // 100 == 2:
+                            if op // 100 == 2:
+                                x += rb
+                            if not 0 <= x < len(mem):
+                                break  # past the list, or sparse
+                            x = mem[x]
+                        self.output_val = x
+                        self.paused = True
+                        ip += 2
+                        count += 1
+                        return False
+                    elif code == 99:
+                        self.halted = True
+                        ip += 1
+                        count += 1
+                        return False
+                    break
+                if block is self.INTERPRET:
+                    break
+                res = block.func(mem, rb, dirty)
+                if res is None:
+                    break
+                if res is False:
+                    self._rewritten(block)
+                    continue
+                ip, rb, executed = res
+                count += executed
+            else:
+                return False
+        finally:
+            self.instruction_pointer = ip
+            self.relative_base = rb
+            self.instructions += count
+        if block is self.INTERPRET:
+            return super()._execute(limit - count)
+        return True
+
+    def _rewritten(self, block):
+        for start, words in block.ranges:
+            for addr, word in enumerate(words, start):
+                if self.get_addr(addr) != word:
+                    self._volatile.add(addr)
+        rewrites = self._rewrites.get(block.start, 0) + 1
+        self._rewrites[block.start] = rewrites
+        if rewrites > self.REWRITE_LIMIT:
+            self._blocks[block.start] = self.INTERPRET
+        else:
+            del self._blocks[block.start]
@@ -0,0 +1,767 @@
+from collections import deque, namedtuple
+from itertools import islice, takewhile
+import hashlib
+import json
+import sys
+
+from .watch import MemoryView, WatchedPages
+
+
+class HaltedError(Exception):
+    pass
+
+
+class NoInputError(Exception):
+    pass
+
+
+# A decoded instruction: ``word`` is the memory value it was decoded from and
+# ``handler`` the Computer method that executes it.
+Instruction = namedtuple(
+    "Instruction",
+    ("word", "opcode", "mode_1", "mode_2", "mode_3", "size", "handler"))
+
+
+def sink_full(sink):
+    """Whether an output sink has no room for another output."""
+    full = getattr(sink, 'full', None)
+    if full is not None:
+        return full()
+    return sink.maxlen is not None and len(sink) >= sink.maxlen
+
+
+class Snapshot:
+    """
+    A saved machine state, made by ``Computer.snapshot``.
+
+    Memory is held as the pages that differ from the program image, so a
+    snapshot costs O(dirty pages). ``to_bytes``/``from_bytes`` serialise it
+    as JSON, tagged with a digest of the program it belongs to.
+    """
+
+    def __init__(self, program, pages, sparse, length, registers, input_vals):
+        self.program = program
+        self.pages = pages  # page number -> tuple of words
+        self.sparse = sparse  # page number -> tuple of words
+        self.length = length  # of the memory list
+        self.registers = registers
+        self.input_vals = input_vals
+
+    @staticmethod
+    def digest(program):
+        return hashlib.sha256(
+            ','.join(map(str, program)).encode()).hexdigest()
+
+    def to_bytes(self):
+        return json.dumps({
+            'program': self.digest(self.program),
+            'pages': list(self.pages.items()),
+            'sparse': list(self.sparse.items()),
+            'length': self.length,
+            'registers': self.registers,
+            'input_vals': self.input_vals,
+        }).encode()
+
+    @classmethod
+    def from_bytes(cls, data, program):
+        """Load a snapshot of ``program`` saved by ``to_bytes``."""
+        state = json.loads(data)
+        program = tuple(program)
+        if state['program'] != cls.digest(program):
+            raise ValueError("Snapshot is of a different program")
+        return cls(
+            program,
+            {page: tuple(words) for page, words in state['pages']},
+            {page: tuple(words) for page, words in state['sparse']},
+            state['length'], tuple(state['registers']),
+            tuple(state['input_vals']))
+
+
+class Computer:
+    """
+    The shared Intcode machine used by every day.
+
+    ``run`` is the fast path: a single dispatch loop working on local
+    variables, with no per-instruction lists, getattr lookups or method
+    calls. It aims for at least 2 million instructions per second on CPython
+    3.11 (check with ``python -m intcode.bench``). ``step`` is the generic,
+    table driven path built on OPERATIONS and OP_SIGNATURES. The fast loop
+    falls back to it for the rare instruction that touches memory past the
+    end of the program.
+
+    ``decode`` caches one Instruction per address for the generic path and
+    for tools that walk the program. ``set_addr`` drops the entry for any
+    address it writes, and an entry is only trusted while the word it was
+    decoded from is still in memory, so writes made by the fast loop and
+    ``load`` can never leave a stale entry behind. The fast loop itself
+    decodes inline: three integer operations on the opcode word beat a
+    dict lookup plus tuple unpacking per instruction in CPython.
+
+    Memory is one flat list, so the fast loop indexes it directly. Every
+    write also marks its PAGE_SIZE page dirty, and ``load`` copies back
+    only the dirty pages from the shared, immutable ``program`` tuple, so a
+    reset costs work in proportion to what the last run wrote rather than
+    to the program length. The list only grows to cover addresses within
+    SPARSE_GAP of its end; anything further out lives in sparse pages
+    that are allocated on first write, so a program can use address 10**9
+    without a billion-word list. ``page_stats`` reports what was touched.
+    The same dirty pages make ``snapshot`` and ``restore`` cheap, so
+    searches can fork from any state instead of replaying moves, and
+    carry ``watch`` callbacks on writes to chosen addresses.
+
+    I/O protocol: ``run`` returns after each output (``paused``), on halt
+    (``halted``), or when input is needed, none is queued and
+    ``block_on_input`` is set (``input_needed``). Otherwise a missing input
+    is fetched with ``input_getter(computer)``. Given an instruction
+    budget, it also returns when that runs out (``preempted``).
+
+    If ``output_sink`` is set (a deque, usually another machine's
+    ``input_vals``), outputs are appended to it and ``run`` carries on
+    instead of pausing. A sink with a ``maxlen`` (or, like a pipeline's
+    ``Fanout``, a ``full`` method) bounds ``run``: it returns with
+    ``output_blocked`` set as soon as an output fills the sink, and while
+    the sink is full it stops before the next output instruction.
+    ``run_until_outputs`` and ``records`` use this to run to the end of
+    a fixed-size record in one call.
+
+    ASCII programs can be driven a script at a time: ``write_text``
+    queues a whole string, and ``read_all`` and ``read_until`` return the
+    output buffered in the sink as bytes.
+    """
+    OPERATIONS = {
+        1: 'add',
+        2: 'mul',
+        3: 'use_input',
+        4: 'ret_output',
+        5: 'jump_if_true',
+        6: 'jump_if_false',
+        7: 'less_than',
+        8: 'equals',
+        9: 'offset_rel_base',
+        99: 'halt'
+    }
+
+    GET = 'get'
+    SET = 'set'
+    PARAM_TYPES = (GET, SET)
+
+    OP_SIGNATURES = {
+        'add': (GET, GET, SET),
+        'mul': (GET, GET, SET),
+        'less_than': (GET, GET, SET),
+        'equals': (GET, GET, SET),
+        'jump_if_true': (GET, GET),
+        'jump_if_false': (GET, GET),
+        'offset_rel_base': (GET,),
+        'use_input': (SET,),
+        'ret_output': (GET,),
+        'halt': ()
+    }
+
+    GROWTH = 256
+    PAGE_SHIFT = 6
+    PAGE_SIZE = 1 << PAGE_SHIFT
+    SPARSE_GAP = 1 << 16
+    # CPython 3.11 only specialises a function's bytecode once it has been
+    # called a few times, so one long call to the fast loop would run it
+    # unspecialised throughout. ``run`` calls it in slices of this many
+    # instructions instead.
+    SLICE = 4096
+
+    output_val = None
+    input_getter = None
+    block_on_input = False
+    output_sink = None
+
+    def __init__(self, program):
+        self.program = tuple(program)
+        self.input_vals = deque()
+        self.instructions = 0
+        self._decoded = {}
+        self.memory = list(self.program)
+        self._sparse = {}  # page number -> list, for pages past the list
+        self._dirty = set()
+        self.load()
+
+    @classmethod
+    def from_filename(cls, filename):
+        with open(filename) as f:
+            return cls(map(int, f.read().split(',')))
+
+    def load(self):
+        """
+        Reset the machine, restoring only the pages written since.
+
+        Outputs still waiting in ``output_sink`` are dropped, so when
+        machines share channels, load them all before queuing input.
+        """
+        self._reset_pages(self._dirty)
+        self._sparse.clear()
+        self._dirty.clear()
+        self.instruction_pointer = 0
+        self.relative_base = 0
+        self.input_vals.clear()
+        if self.output_sink is not None:
+            self.output_sink.clear()
+        self.output_val = None
+        self.halted = False
+        self.paused = True
+        self.input_needed = False
+        self.output_blocked = False
+        self.preempted = False
+
+    def _reset_pages(self, pages):
+        """Put ``pages`` of the memory list back to the program image."""
+        mem = self.memory
+        program = self.program
+        n = len(program)
+        size = self.PAGE_SIZE
+        for page in pages:
+            lo = page * size
+            hi = min(lo + size, len(mem))
+            if hi <= n:
+                mem[lo:hi] = program[lo:hi]
+            elif lo < hi:
+                # Memory grown past the program is kept, zeroed.
+                mem[lo:hi] = program[lo:n] + (0,) * (hi - max(lo, n))
+
+    def snapshot(self):
+        """Save the machine's state: memory, registers and queued input."""
+        mem = self.memory
+        size = self.PAGE_SIZE
+        pages = {}
+        for page in self._dirty:
+            if page in self._sparse:
+                continue
+            lo = page * size
+            if lo < len(mem):
+                pages[page] = tuple(mem[lo:lo + size])
+        sparse = {page: tuple(words) for page, words in self._sparse.items()}
+        registers = (self.instruction_pointer, self.relative_base,
+                     self.output_val, self.halted)
+        return Snapshot(self.program, pages, sparse, len(mem), registers,
+                        tuple(self.input_vals))
+
+    def restore(self, snap):
+        """
+        Return the machine to a snapshot of the same program.
+
+        Only the pages dirty now or in the snapshot are touched. The
+        instruction count keeps running, and channels stay connected:
+        ``input_vals`` is refilled in place, and outputs still waiting in
+        ``output_sink`` are dropped, as by ``load``.
+        """
+        if snap.program is not self.program and snap.program != self.program:
+            raise ValueError("Snapshot is of a different program")
+        mem = self.memory
+        if len(mem) < snap.length:
+            mem.extend([0] * (snap.length - len(mem)))
+        self._reset_pages(self._dirty.difference(snap.pages))
+        size = self.PAGE_SIZE
+        for page, words in snap.pages.items():
+            mem[page * size:page * size + len(words)] = words
+        self._sparse = {}
+        for page, words in snap.sparse.items():
+            if page * size < len(mem):
+                # The list has grown over the page since the snapshot.
+                mem[page * size:(page + 1) * size] = words
+            else:
+                self._sparse[page] = list(words)
+        self._dirty.clear()
+        self._dirty.update(snap.pages, snap.sparse)
+        (self.instruction_pointer, self.relative_base,
+         self.output_val, self.halted) = snap.registers
+        self.input_vals.clear()
+        self.input_vals.extend(snap.input_vals)
+        if self.output_sink is not None:
+            self.output_sink.clear()
+        self.paused = True
+        self.input_needed = False
+        self.output_blocked = False
+        self.preempted = False
+
+    def watch(self, addrs, callback):
+        """
+        Call ``callback(comp, addr, old, new)`` when a word changes.
+
+        ``addrs`` is an address or a range of them. See ``intcode.watch``.
+        """
+        if not isinstance(self._dirty, WatchedPages):
+            self._dirty = WatchedPages(self, self._dirty)
+        if isinstance(addrs, int):
+            addrs = (addrs,)
+        for addr in addrs:
+            self._dirty.watch(addr, callback)
+
+    def unwatch(self, callback):
+        """Stop calling ``callback`` for any address."""
+        if isinstance(self._dirty, WatchedPages):
+            self._dirty.unwatch(callback)
+
+    def view(self, fields=None):
+        """A read-only MemoryView of this machine, with named ``fields``."""
+        return MemoryView(self, fields)
+
+    def get_addr(self, addr):
+        if addr > len(self.memory) - 1:
+            if addr >= len(self.memory) + self.SPARSE_GAP:
+                page = self._sparse.get(addr >> self.PAGE_SHIFT)
+                if page is None:
+                    return 0
+                return page[addr & self.PAGE_SIZE - 1]
+            self._grow(addr)
+        return self.memory[addr]
+
+    def set_addr(self, addr, val):
+        if addr > len(self.memory) - 1:
+            if addr >= len(self.memory) + self.SPARSE_GAP:
+                page = self._sparse.get(addr >> self.PAGE_SHIFT)
+                if page is None:
+                    page = [0] * self.PAGE_SIZE
+                    self._sparse[addr >> self.PAGE_SHIFT] = page
+                page[addr & self.PAGE_SIZE - 1] = val
+                self._dirty.add(addr >> self.PAGE_SHIFT)
+                self._decoded.pop(addr, None)
+                return
+            self._grow(addr)
+        self.memory[addr] = val
+        self._dirty.add(addr >> self.PAGE_SHIFT)
+        self._decoded.pop(addr, None)
+
+    def _grow(self, addr):
+        # Grow in whole chunks so a program working just past the end of
+        # memory doesn't leave the fast paths one address at a time. The
+        # new length is a multiple of GROWTH, and so of PAGE_SIZE, so any
+        # sparse pages it now covers move into the list whole.
+        mem = self.memory
+        length = addr + 1
+        length += -length % self.GROWTH
+        mem.extend([0] * (length - len(mem)))
+        size = self.PAGE_SIZE
+        for page in [p for p in self._sparse if p * size < length]:
+            mem[page * size:(page + 1) * size] = self._sparse.pop(page)
+
+    def page_stats(self):
+        """
+        Summarise the memory this machine has touched, in pages.
+
+        ``program`` pages hold the program image, ``grown`` pages extend the
+        list past it, ``sparse`` pages are far addresses allocated one page
+        at a time, and ``dirty`` pages have been written since ``load``.
+        """
+        size = self.PAGE_SIZE
+        program = -(-len(self.program) // size)
+        return {
+            'page_size': size,
+            'program': program,
+            'grown': -(-len(self.memory) // size) - program,
+            'sparse': len(self._sparse),
+            'dirty': len(self._dirty),
+        }
+
+    def decode(self, addr):
+        """Return the Instruction at ``addr``, decoding it at most once."""
+        word = self.get_addr(addr)
+        inst = self._decoded.get(addr)
+        if inst is None or inst.word != word:
+            opcode, modes = self.parse_opcode(word)
+            if opcode not in self.OPERATIONS:
+                raise ValueError("Unknown opcode {} at {}".format(word, addr))
+            name = self.OPERATIONS[opcode]
+            size = len(self.OP_SIGNATURES[name]) + 1
+            inst = Instruction(
+                word, opcode, *modes, size, getattr(type(self), name))
+            self._decoded[addr] = inst
+        return inst
+
+    def run(self, input_vals=(), max_instructions=None):
+        """
+        Run until an output, halt or blocking input (see the class docs).
+
+        With ``max_instructions``, also return once that many instructions
+        have run, with ``preempted`` set, so a machine that computes for a
+        long time without I/O can share a thread. The budget is counted
+        down by the fast loop itself; CompiledComputer can overshoot it by
+        up to one block.
+        """
+        if self.halted:
+            raise HaltedError
+        if not isinstance(input_vals, (tuple, list)):
+            input_vals = [input_vals]
+        self.input_vals.extend(input_vals)
+        self.paused = False
+        self.input_needed = False
+        self.output_blocked = False
+        self.preempted = False
+        end = sys.maxsize
+        if max_instructions is not None:
+            end = self.instructions + max_instructions
+        while True:
+            left = end - self.instructions
+            if left <= 0:
+                self.preempted = True
+                break
+            if self._execute(left if left < self.SLICE else self.SLICE):
+                # The fast loop hit the end of memory; let the generic path
+                # grow it and carry on.
+                if self.step():
+                    break
+            elif (self.paused or self.halted or self.input_needed
+                    or self.output_blocked):
+                break
+        return self.output_val
+
+    def run_to_halt(self, input_vals=()):
+        """Run until the program halts, returning every output."""
+        outputs = []
+        self.run(input_vals)
+        while not self.halted:
+            if self.input_needed:
+                raise NoInputError
+            outputs.append(self.output_val)
+            self.run()
+        return outputs
+
+    def run_until_outputs(self, n, input_vals=()):
+        """
+        Run until ``n`` more outputs, returning them as a tuple.
+
+        The tuple is shorter if the program halts or blocks on input first.
+        Runs in one call to the fast loop rather than one per output.
+        """
+        sink = self.output_sink
+        self.output_sink = outputs = deque(maxlen=n)
+        try:
+            self.run(input_vals)
+        finally:
+            self.output_sink = sink
+            self.output_blocked = False
+        return tuple(outputs)
+
+    def records(self, size):
+        """
+        Yield the outputs in tuples of ``size``, until the program halts
+        or blocks on input. A partial record at that point is an error.
+        """
+        sink = self.output_sink
+        outputs = deque(maxlen=size)
+        while not self.halted:
+            self.output_sink = outputs
+            try:
+                self.run()
+            finally:
+                self.output_sink = sink
+                self.output_blocked = False
+            if len(outputs) < size:
+                if outputs:
+                    raise ValueError("Partial record {} at {}".format(
+                        tuple(outputs), self.instruction_pointer))
+                return
+            record = tuple(outputs)
+            outputs.clear()
+            yield record
+
+    def write_text(self, text):
+        """Queue ``text`` as ASCII input, all in one go."""
+        self.input_vals.extend(text.encode('ascii'))
+
+    def read_all(self):
+        """
+        Run until input is needed or the program halts, and return the
+        text output so far as bytes.
+
+        Outputs are buffered in ``output_sink`` (a deque, made if there is
+        none), so the loop never comes back to Python per character. A
+        word that doesn't fit in a byte ends the text in front of it;
+        ``read_word`` takes it.
+        """
+        self._fill()
+        return self._take_text(len(self._peek_text()))
+
+    def read_until(self, delimiter=b'\n'):
+        """
+        Return text output up to and including ``delimiter``, running as
+        needed. Anything after it stays buffered for the next read. If the
+        machine stops first, returns what text there is.
+        """
+        while True:
+            text = self._peek_text()
+            end = text.find(delimiter)
+            if end >= 0:
+                return self._take_text(end + len(delimiter))
+            if (self.halted or len(text) < len(self.output_sink)
+                    or (self.input_needed and not self.input_vals)):
+                return self._take_text(len(text))
+            self._fill()
+
+    def read_word(self):
+        """Return the next output as a number, running if none is buffered."""
+        if not self.output_sink:
+            self._fill()
+        return self.output_sink.popleft()
+
+    def _fill(self):
+        """Run, buffering output, until it needs input or halts."""
+        if self.output_sink is None:
+            self.output_sink = deque()
+        if self.halted:
+            return
+        block_on_input = self.block_on_input
+        self.block_on_input = True
+        try:
+            self.run()
+        finally:
+            self.block_on_input = block_on_input
+
+    def _peek_text(self):
+        """The buffered outputs up to the first one that isn't a byte."""
+        sink = self.output_sink
+        if sink is None:
+            return b''
+        try:
+            return bytes(sink)
+        except ValueError:
+            return bytes(takewhile(range(256).__contains__, sink))
+
+    def _take_text(self, n):
+        """Remove the first ``n`` buffered outputs, returning them as bytes."""
+        sink = self.output_sink
+        if n >= len(sink):
+            text = bytes(sink)
+            sink.clear()
+        else:
+            text = bytes(islice(sink, n))
+            rest = list(islice(sink, n, None))
+            sink.clear()
+            sink.extend(rest)
+        return text
+
+    def _execute(self, limit=sys.maxsize):
+        """
+        The fast loop. Returns True if it stopped on an out-of-range address.
+
+        It also stops, returning False, once it has executed ``limit``
+        instructions.
+
+        Every instruction does all of its reads before any write, and only
+        moves the instruction pointer once it has written, so an IndexError
+        always leaves the machine at the start of the failing instruction.
+        """
+        mem = self.memory
+        inputs = self.input_vals
+        mark_dirty = self._dirty.add
+        shift = self.PAGE_SHIFT
+        sink = self.output_sink
+        if sink is not None:
+            # A sink of several channels has its own test for fullness.
+            full = getattr(sink, 'full', None)
+            capacity = sink.maxlen if full is None else None
+            if capacity is None:
+                capacity = float('inf')
+        ip = self.instruction_pointer
+        rb = self.relative_base
+        count = 0
+        try:
+            while count < limit:
+                op = mem[ip]
+                code = op % 100
+                m1 = op // 100 % 10
+                m2 = op // 1000 % 10
+                if code == 1 or code == 2 or code == 7 or code == 8:
+                    x = mem[ip + 1]
+                    if m1 == 0:
+                        x = mem[x]
+                    elif m1 == 2:
+                        x = mem[x + rb]
+                    y = mem[ip + 2]
+                    if m2 == 0:
+                        y = mem[y]
+                    elif m2 == 2:
+                        y = mem[y + rb]
+                    dst = mem[ip + 3]
+                    if op // 10000 == 2:
+                        dst += rb
+                    if code == 1:
+                        mem[dst] = x + y
+                    elif code == 2:
+                        mem[dst] = x * y
+                    elif code == 7:
+                        mem[dst] = 1 if x < y else 0
+                    else:
+                        mem[dst] = 1 if x == y else 0
+                    mark_dirty(dst >> shift)
+                    ip += 4
+                elif code == 5 or code == 6:
+                    x = mem[ip + 1]
+                    if m1 == 0:
+                        x = mem[x]
+                    elif m1 == 2:
+                        x = mem[x + rb]
+                    if (x != 0) == (code == 5):
+                        y = mem[ip + 2]
+                        if m2 == 0:
+                            y = mem[y]
+                        elif m2 == 2:
+                            y = mem[y + rb]
+                        ip = y
+                    else:
+                        ip += 3
+                elif code == 9:
+                    x = mem[ip + 1]
+                    if m1 == 0:
+                        x = mem[x]
+                    elif m1 == 2:
+                        x = mem[x + rb]
+                    rb += x
+                    ip += 2
+                elif code == 3:
+                    dst = mem[ip + 1]
+                    if m1 == 2:
+                        dst += rb
+                    mem[dst]  # fail here, not after the input is consumed
+                    if inputs:
+                        mem[dst] = inputs.popleft()
+                    elif self.block_on_input:
+                        self.input_needed = True
+                        return False
+                    elif self.input_getter is not None:
+                        self.instruction_pointer = ip
+                        self.relative_base = rb
+                        mem[dst] = self.input_getter(self)
+                        # The getter may have set a watch, which replaces
+                        # the dirty-page set.
+                        mark_dirty = self._dirty.add
+                    else:
+                        raise NoInputError
+                    mark_dirty(dst >> shift)
+                    ip += 2
+                elif code == 4:
+                    x = mem[ip + 1]
+                    if m1 == 0:
+                        x = mem[x]
+                    elif m1 == 2:
+                        x = mem[x + rb]
+                    if sink is None:
+                        self.output_val = x
+                        self.paused = True
+                        ip += 2
+                        count += 1
+                        return False
+                    if len(sink) >= capacity if full is None else full():
+                        self.output_blocked = True
+                        return False
+                    sink.append(x)
+                    self.output_val = x
+                    ip += 2
+                    if len(sink) >= capacity if full is None else full():
+                        # Stop at once rather than run on to the next
+                        # output, so a full sink ends a record.
+                        count += 1
+                        self.output_blocked = True
+                        return False
+                elif code == 99:
+                    self.halted = True
+                    ip += 1
+                    count += 1
+                    return False
+                else:
+                    raise ValueError(
+                        "Unknown opcode {} at {}".format(op, ip))
+                count += 1
+            return False
+        except IndexError:
+            return True
+        finally:
+            self.instruction_pointer = ip
+            self.relative_base = rb
+            self.instructions += count
+
+    def step(self):
+        """
+        Execute one instruction through the generic path.
+
+        Returns True if the caller's run loop should stop: after an output
+        (unless it went to ``output_sink``), on halt, or when blocked on
+        input or on a full sink.
+        """
+        self.paused = False
+        self.input_needed = False
+        self.output_blocked = False
+        ip = self.instruction_pointer
+        inst = self.decode(ip)
+        if inst.opcode == 3 and not self.input_vals:
+            if self.block_on_input:
+                self.input_needed = True
+                return True
+            if self.input_getter is None:
+                raise NoInputError
+        sink = self.output_sink
+        if inst.opcode == 4 and sink is not None and sink_full(sink):
+            self.output_blocked = True
+            return True
+        sigs = self.OP_SIGNATURES[self.OPERATIONS[inst.opcode]]
+        modes = (inst.mode_1, inst.mode_2, inst.mode_3)
+        self.instruction_pointer += inst.size  # gets changed later in jumps
+        get_params = []
+        set_params = []
+        for offset, (sig, mode) in enumerate(zip(sigs, modes), 1):
+            param = self.get_addr(ip + offset)
+            if mode == 2:
+                param += self.relative_base
+            if sig == self.SET:
+                set_params.append(param)
+            elif mode == 1:
+                get_params.append(param)
+            else:
+                get_params.append(self.get_addr(param))
+        res = inst.handler(self, *get_params)
+        # If set_params is empty, this does nothing.
+        for set_param in set_params:
+            self.set_addr(set_param, res)
+        self.instructions += 1
+        return self.paused or self.halted or self.output_blocked
+
+    def parse_opcode(self, opcode):
+        normal_opcode = opcode % 100
+        modes = (opcode // 100 % 10, opcode // 1000 % 10, opcode // 10000)
+        return (normal_opcode, modes)
+
+    def add(self, x, y):
+        return x + y
+
+    def mul(self, x, y):
+        return x * y
+
+    def less_than(self, x, y):
+        return int(x < y)
+
+    def equals(self, x, y):
+        return int(x == y)
+
+    def use_input(self):
+        if not self.input_vals:
+            return self.input_getter(self)
+        return self.input_vals.popleft()
+
+    def ret_output(self, x):
+        self.output_val = x
+        sink = self.output_sink
+        if sink is None:
+            self.paused = True
+        else:
+            sink.append(x)
+            if sink_full(sink):
+                self.output_blocked = True
+
+    def jump_if_true(self, x, y):
+        if x:
+            self.instruction_pointer = y
+
+    def jump_if_false(self, x, y):
+        return self.jump_if_true(not(x), y)
+
+    def halt(self):
+        self.halted = True
+
+    def offset_rel_base(self, x):
+        self.relative_base += x
@@ -0,0 +1,126 @@
+"""
+Memoised queries: programs run to halt as pure functions of their inputs.
+
+Some days ask the same question of a program over and over, like day19's
+"is (x, y) in the beam?". When a run depends on nothing but its inputs, its
+outputs can be cached by (program digest, inputs). QueryCache keeps a
+bounded LRU of recent answers in memory and, optionally, every answer in a
+``shelve`` file, so a second run of the day can skip the machine entirely.
+"""
+from collections import OrderedDict
+import shelve
+
+from .computer import Computer, Snapshot
+from .sweep import map_queries
+
+
+class QueryCache:
+    """
+    Answers ``query(inputs)`` for one program, running it only on a miss.
+
+    ``maxsize`` bounds the in-memory LRU. With ``store``, a filename, answers
+    are also kept on disk and looked up there before running the program;
+    call ``close`` (or use the cache as a context manager) to flush it.
+    ``hits``, ``disk_hits`` and ``misses`` count where answers came from.
+    """
+
+    def __init__(self, program, maxsize=4096, store=None, cls=Computer):
+        self.comp = cls(program)
+        self.digest = Snapshot.digest(self.comp.program)
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # inputs -> outputs
+        self.store = shelve.open(store) if store is not None else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def query(self, inputs):
+        """The outputs of a run to halt on ``inputs``, as a tuple."""
+        inputs = tuple(inputs)
+        outputs = self.entries.get(inputs)
+        if outputs is not None:
+            self.hits += 1
+            self.entries.move_to_end(inputs)
+            return outputs
+        key = self._key(inputs)
+        if self.store is not None and key in self.store:
+            self.disk_hits += 1
+            outputs = self.store[key]
+        else:
+            self.misses += 1
+            outputs = self._run(inputs)
+            if self.store is not None:
+                self.store[key] = outputs
+        self._remember(inputs, outputs)
+        return outputs
+
+    def _key(self, inputs):
+        return '{}:{}'.format(self.digest, ','.join(map(str, inputs)))
+
+    def _run(self, inputs):
+        self.comp.load()
+        return tuple(self.comp.run_to_halt(inputs))
+
+    def _remember(self, inputs, outputs):
+        self.entries[inputs] = outputs
+        self.entries.move_to_end(inputs)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def query_many(self, queries, executor=None):
+        """
+        ``query`` for each of ``queries``, running the misses together.
+
+        With ``executor``, a pool from ``sweep.worker_pool`` for the same
+        program, the misses run in its worker processes.
+        """
+        queries = [tuple(inputs) for inputs in queries]
+        answers = {}
+        missing = {}  # inputs -> None, an ordered set
+        for inputs in queries:
+            if inputs in answers or inputs in missing:
+                self.hits += 1
+                continue
+            outputs = self.entries.get(inputs)
+            if outputs is not None:
+                self.hits += 1
+            elif self.store is not None:
+                outputs = self.store.get(self._key(inputs))
+                if outputs is not None:
+                    self.disk_hits += 1
+            if outputs is None:
+                missing[inputs] = None
+            else:
+                answers[inputs] = outputs
+        if executor is None:
+            fresh = [self._run(inputs) for inputs in missing]
+        else:
+            fresh = map_queries(executor, list(missing))
+        self.misses += len(missing)
+        for inputs, outputs in zip(missing, fresh):
+            answers[inputs] = outputs
+            if self.store is not None:
+                self.store[self._key(inputs)] = outputs
+        for inputs, outputs in answers.items():
+            self._remember(inputs, outputs)
+        return [answers[inputs] for inputs in queries]
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (lookups - self.misses) / lookups if lookups else 0,
+        }
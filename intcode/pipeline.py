@@ -0,0 +1,118 @@
+"""
+Pipelines of Intcode machines joined by bounded channels.
+
+A channel is a deque that is both the producer's ``output_sink`` and the
+consumer's ``input_vals``. The producer's run loop appends each output
+straight onto the consumer's input queue, so nothing passes through
+Python lists by hand. Channels can form any graph: chains, DAGs, and
+cycles such as day07's feedback loop.
+"""
+from collections import deque
+import time
+
+
+class Fanout:
+    """An output sink that copies every value into several channels."""
+
+    def __init__(self, channels):
+        self.channels = channels
+
+    def full(self):
+        """Whether any bounded channel is full; unbounded ones never are."""
+        return any(len(ch) >= ch.maxlen for ch in self.channels
+                   if ch.maxlen is not None)
+
+    def append(self, val):
+        for ch in self.channels:
+            ch.append(val)
+
+    def clear(self):
+        for ch in self.channels:
+            ch.clear()
+
+
+class Pipeline:
+    """
+    A set of machines and the channels between them.
+
+    ``run`` is the scheduler: it runs each machine in turn until that
+    machine blocks (on an empty input channel or a full output channel)
+    or halts, and goes round again until a full pass makes no progress.
+    A machine that outputs should have a channel for it: without one its
+    outputs only pass through ``output_val``.
+
+    With a ``quantum``, each turn is also cut off after that many
+    instructions, so a machine that computes for a long time between
+    reads can't hold up the rest. ``max_wait`` records, per stage, the
+    longest wall-clock time it spent waiting between its turns.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.channels = []
+        self.max_wait = []
+
+    def add(self, comp):
+        """Add a machine, making it block rather than fail on empty input."""
+        comp.block_on_input = True
+        self.stages.append(comp)
+        self.max_wait.append(0.0)
+        return comp
+
+    def input_channel(self, comp, capacity=None):
+        """
+        Return the channel feeding ``comp``, creating it if need be.
+
+        Anything already queued on the machine is kept. Several producers
+        can feed the same channel; its capacity is set by the first.
+        """
+        if not any(comp.input_vals is ch for ch in self.channels):
+            comp.input_vals = deque(comp.input_vals, capacity)
+            self.channels.append(comp.input_vals)
+        return comp.input_vals
+
+    def output_channel(self, comp, capacity=None):
+        """Return a new channel collecting ``comp``'s outputs."""
+        channel = deque(maxlen=capacity)
+        self.channels.append(channel)
+        self._attach(comp, channel)
+        return channel
+
+    def connect(self, src, dst, capacity=None):
+        """Feed ``src``'s outputs to ``dst``, returning the channel."""
+        channel = self.input_channel(dst, capacity)
+        self._attach(src, channel)
+        return channel
+
+    def _attach(self, comp, channel):
+        sink = comp.output_sink
+        if sink is None:
+            comp.output_sink = channel
+        elif isinstance(sink, Fanout):
+            sink.channels.append(channel)
+        else:
+            comp.output_sink = Fanout([sink, channel])
+
+    def run(self, quantum=None):
+        """
+        Run until every machine has halted or none can make progress.
+
+        Returns True if every machine halted.
+        """
+        clock = time.perf_counter
+        turn_ended = [clock()] * len(self.stages)
+        while True:
+            progress = False
+            for i, comp in enumerate(self.stages):
+                if comp.halted:
+                    continue
+                start = clock()
+                if start - turn_ended[i] > self.max_wait[i]:
+                    self.max_wait[i] = start - turn_ended[i]
+                before = comp.instructions
+                comp.run(max_instructions=quantum)
+                if comp.instructions != before:
+                    progress = True
+                turn_ended[i] = clock()
+            if not progress:
+                return all(comp.halted for comp in self.stages)
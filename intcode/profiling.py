@@ -0,0 +1,161 @@
+"""
+Opt-in profiling for the Intcode machine.
+
+``Profile.attach(comp)`` swaps the machine's fast loop for one that steps
+through the generic path and records, for every executed instruction, its
+address and opcode, plus how often an input instruction found nothing
+queued. The swap is an instance attribute, so machines that aren't
+profiled run the unmodified fast loop and pay nothing for this module.
+Profiled machines run several times slower, so their instructions per
+second say where time goes relative to each other, not how fast the
+machine really is; the command line tool reports both.
+
+Run from the repository root with ``python -m intcode.profiling``, adding
+``--json FILE`` for the full reports or ``--folded FILE`` for folded stacks
+(``workload;opcode;address count``) to feed a flame graph tool.
+"""
+from collections import Counter
+import argparse
+import json
+import sys
+import time
+
+from .bench import WORKLOADS, load_program, measure
+from .computer import Computer
+
+
+class Profile:
+    """Counts gathered from one or more machines."""
+
+    def __init__(self):
+        self.counts = Counter()  # (address, opcode) -> executions
+        self.input_waits = 0
+        self.seconds = 0.0
+
+    def attach(self, comp):
+        """Profile ``comp`` into this Profile from now on, returning it."""
+        def execute(limit=sys.maxsize):
+            return self._execute(comp, limit)
+        comp._execute = execute
+        return comp
+
+    @staticmethod
+    def detach(comp):
+        """Put ``comp`` back on its own fast loop."""
+        comp.__dict__.pop('_execute', None)
+
+    def _execute(self, comp, limit):
+        """A stand-in for the fast loop, built on ``step``."""
+        counts = self.counts
+        step = comp.step
+        count = 0
+        start = time.perf_counter()
+        try:
+            while count < limit:
+                ip = comp.instruction_pointer
+                opcode = comp.get_addr(ip) % 100
+                if opcode == 3 and not comp.input_vals:
+                    self.input_waits += 1
+                before = comp.instructions
+                stop = step()
+                if comp.instructions != before:
+                    counts[ip, opcode] += 1
+                    count += 1
+                if stop:
+                    break
+            return False
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    @property
+    def instructions(self):
+        return sum(self.counts.values())
+
+    @property
+    def ips(self):
+        return self.instructions / self.seconds if self.seconds else 0.0
+
+    def opcodes(self):
+        """Executions per operation name, most frequent first."""
+        totals = Counter()
+        for (__, opcode), n in self.counts.items():
+            totals[Computer.OPERATIONS.get(opcode, str(opcode))] += n
+        return totals.most_common()
+
+    def hot_addresses(self, n=None):
+        """The ``n`` most executed instruction addresses, with counts."""
+        totals = Counter()
+        for (addr, __), count in self.counts.items():
+            totals[addr] += count
+        return totals.most_common(n)
+
+    def report(self, top=20):
+        return {
+            'instructions': self.instructions,
+            'seconds': self.seconds,
+            'ips': self.ips,
+            'input_waits': self.input_waits,
+            'opcodes': dict(self.opcodes()),
+            'hot_addresses': self.hot_addresses(top),
+        }
+
+    def folded(self, root):
+        """Folded stack lines, one per (opcode, address), under ``root``."""
+        lines = []
+        for (addr, opcode), n in sorted(self.counts.items()):
+            name = Computer.OPERATIONS.get(opcode, str(opcode))
+            lines.append("{};{};@{} {}".format(root, name, addr, n))
+        return lines
+
+
+PROFILE_WORKLOADS = [
+    (name, day, workload) for name, day, workload in WORKLOADS
+    if day in (13, 19, 21, 23, 25)
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--json', metavar='FILE',
+                        help="write every report to FILE as JSON")
+    parser.add_argument('--folded', metavar='FILE',
+                        help="write folded stacks to FILE")
+    parser.add_argument('--top', type=int, default=5,
+                        help="hot addresses to print per workload")
+    args = parser.parse_args(argv)
+
+    reports = {}
+    folded = []
+    for name, day, workload in PROFILE_WORKLOADS:
+        program = load_program(day)
+        comps, elapsed = measure(Computer, program, workload)
+        native_ips = sum(comp.instructions for comp in comps) / elapsed
+        profile = Profile()
+        measure(lambda program: profile.attach(Computer(program)),
+                program, workload)
+        report = profile.report()
+        report['native_ips'] = native_ips
+        reports[name] = report
+        folded.extend(profile.folded(name.replace(' ', '_')))
+
+        print("{}: {:,} instructions, {:,.0f}/s ({:,.0f}/s profiled), "
+              "{:,} input waits".format(
+                  name, report['instructions'], native_ips, report['ips'],
+                  report['input_waits']))
+        print("  opcodes: " + ", ".join(
+            "{} {:.0%}".format(op, n / report['instructions'])
+            for op, n in profile.opcodes()))
+        print("  hot addresses: " + ", ".join(
+            "@{} {:,}".format(addr, n)
+            for addr, n in profile.hot_addresses(args.top)))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+    if args.folded:
+        with open(args.folded, 'w') as f:
+            f.write('\n'.join(folded) + '\n')
+
+
+if __name__ == "__main__":
+    main()
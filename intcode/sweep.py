@@ -0,0 +1,134 @@
+"""
+Parameter sweeps: run one program once per point of a grid, in parallel.
+
+``sweep`` spreads the grid over a ProcessPoolExecutor in chunks. Each worker
+keeps a single Computer for the program and reuses it through ``load``, so
+a run costs only the pages the previous one dirtied. Results come back in
+grid order whatever order the workers finish in, and a ``match`` stops the
+sweep at the first matching point in that order.
+
+``patch``, ``result`` and ``match`` are sent to the workers, so they must be
+picklable: module level functions, not lambdas. A script that sweeps must
+guard its top level code with ``if __name__ == "__main__":``.
+
+For pure queries asked a batch at a time rather than over a grid known up
+front, ``worker_pool`` makes a pool of the same preloaded workers that
+``map_queries`` can be given batches of inputs on.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os
+
+from .computer import Computer
+
+# The worker process's Computer, made once by _init_worker.
+_computer = None
+
+
+def _init_worker(program):
+    global _computer
+    _computer = Computer(program)
+
+
+def _run_chunk(chunk, patch, result, match):
+    """
+    Evaluate ``chunk`` in a worker, returning ``(params, value)`` pairs.
+
+    With ``match``, stop after the first matching point: nothing after it
+    in the chunk can be needed.
+    """
+    comp = _computer
+    found = []
+    for params in chunk:
+        comp.load()
+        patch(comp, params)
+        outputs = comp.run_to_halt()
+        value = outputs if result is None else result(comp)
+        if match is None:
+            found.append((params, value))
+        elif match(value):
+            found.append((params, value))
+            break
+    return found
+
+
+def _run_queries(chunk):
+    """Run to halt once per inputs tuple in ``chunk``, in a worker."""
+    comp = _computer
+    outputs = []
+    for inputs in chunk:
+        comp.load()
+        outputs.append(tuple(comp.run_to_halt(inputs)))
+    return outputs
+
+
+def _chunks(grid, chunk_size):
+    grid = iter(grid)
+    while True:
+        chunk = list(islice(grid, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def worker_pool(program, max_workers=None):
+    """A ProcessPoolExecutor whose workers each hold a Computer for program."""
+    return ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                               initargs=(tuple(program),))
+
+
+def map_queries(executor, queries, chunk_size=64):
+    """
+    The outputs of a run to halt for each inputs tuple in ``queries``.
+
+    ``executor`` must come from ``worker_pool`` for the program. Outputs
+    are tuples, in the order of ``queries``.
+    """
+    futures = [executor.submit(_run_queries, chunk)
+               for chunk in _chunks(queries, chunk_size)]
+    return [outputs for future in futures for outputs in future.result()]
+
+
+def sweep(program, patch, grid, result=None, match=None,
+          max_workers=None, chunk_size=256):
+    """
+    Run ``program`` for every ``params`` in ``grid``.
+
+    For each point a freshly loaded Computer is passed to
+    ``patch(comp, params)``, which sets memory or queues inputs, and the
+    program is then run to halt. The value recorded is ``result(comp)``,
+    or the list of outputs if ``result`` is None.
+
+    Without ``match``, returns every ``(params, value)`` in grid order.
+    With it, returns the first ``(params, value)`` in grid order whose value
+    satisfies ``match``, or None, and stops handing out work as soon as
+    that is known. ``grid`` may be any iterable, including a lazy one far
+    larger than memory: only a few chunks per worker are in flight at once.
+    """
+    max_workers = max_workers or os.cpu_count()
+    results = []
+    chunks = _chunks(grid, chunk_size)
+    with worker_pool(program, max_workers) as executor:
+        pending = deque()  # futures, in grid order
+        try:
+            while True:
+                while len(pending) < 2 * max_workers:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending.append(executor.submit(
+                        _run_chunk, chunk, patch, result, match))
+                if not pending:
+                    break
+                found = pending.popleft().result()
+                if match is None:
+                    results.extend(found)
+                elif found:
+                    return found[0]
+        finally:
+            for future in pending:
+                future.cancel()
+    if match is not None:
+        return None
+    return results
@@ -0,0 +1,122 @@
+"""
+Watchpoints and read-only views of Intcode memory.
+
+Every write the machine makes marks its page dirty, so watchpoints hang off
+that: a watched machine's dirty-page set is a WatchedPages, whose ``add``
+also compares the watched words on the page against their last known
+values and calls back for each one that changed. A machine with nothing
+watched keeps a plain set, so it pays nothing for this module.
+
+Callbacks fire for changes, not for writes of the value already there.
+They run in the middle of an instruction loop, so they can read memory but
+should treat the registers as stale. Once watched, a machine keeps its
+WatchedPages even with every watch removed, since a running loop may hold
+it: from then on each write costs a dict lookup.
+"""
+
+
+def peek(comp, addr):
+    """The word at ``addr`` in ``comp``, without growing its memory."""
+    if addr < len(comp.memory):
+        return comp.memory[addr]
+    page = comp._sparse.get(addr >> comp.PAGE_SHIFT)
+    return 0 if page is None else page[addr & comp.PAGE_SIZE - 1]
+
+
+class WatchedPages(set):
+    """A dirty-page set that reports changes to watched addresses."""
+
+    def __init__(self, comp, pages=()):
+        super().__init__(pages)
+        self.comp = comp
+        self.watches = {}  # page -> {addr: [callbacks]}
+        self.values = {}  # addr -> last known value
+
+    def watch(self, addr, callback):
+        addrs = self.watches.setdefault(addr >> self.comp.PAGE_SHIFT, {})
+        addrs.setdefault(addr, []).append(callback)
+        self.values[addr] = peek(self.comp, addr)
+
+    def unwatch(self, callback):
+        """Drop ``callback`` everywhere. Returns True if nothing is left."""
+        for page, addrs in list(self.watches.items()):
+            for addr, callbacks in list(addrs.items()):
+                if callback in callbacks:
+                    callbacks.remove(callback)
+                if not callbacks:
+                    del addrs[addr]
+                    del self.values[addr]
+            if not addrs:
+                del self.watches[page]
+        return not self.watches
+
+    def add(self, page, _add=set.add):
+        # Called for every write, so kept as lean as it goes.
+        _add(self, page)
+        if page in self.watches:
+            self.check(self.watches[page])
+
+    def update(self, *pages):
+        super().update(*pages)
+        for group in pages:
+            for page in group:
+                addrs = self.watches.get(page)
+                if addrs is not None:
+                    self.check(addrs)
+
+    def clear(self):
+        # Called once memory has been reset by load or restore: those are
+        # not the program's writes, so just catch up.
+        super().clear()
+        for addr in self.values:
+            self.values[addr] = peek(self.comp, addr)
+
+    def check(self, addrs):
+        values = self.values
+        for addr, callbacks in addrs.items():
+            new = peek(self.comp, addr)
+            old = values[addr]
+            if new != old:
+                values[addr] = new
+                for callback in callbacks:
+                    callback(self.comp, addr, old, new)
+
+
+class MemoryView:
+    """
+    Read-only named fields over a machine's memory.
+
+    ``fields`` maps names to an address or a ``range`` of addresses;
+    ``view.name`` reads the word, or a tuple of words, at the time of
+    reading. ``view[addr]`` and ``view[lo:hi]`` read raw memory.
+    """
+
+    def __init__(self, comp, fields=None):
+        object.__setattr__(self, '_comp', comp)
+        object.__setattr__(self, '_fields', dict(fields or {}))
+
+    def __getattr__(self, name):
+        try:
+            addrs = self._fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        if isinstance(addrs, range):
+            return tuple(self[addr] for addr in addrs)
+        return self[addrs]
+
+    def __getitem__(self, addr):
+        if isinstance(addr, slice):
+            return tuple(self[a] for a in
+                         range(addr.start or 0, addr.stop, addr.step or 1))
+        if addr < 0:
+            raise IndexError("Negative address {}".format(addr))
+        return peek(self._comp, addr)
+
+    def __setattr__(self, name, val):
+        raise AttributeError("MemoryView is read-only")
+
+    def __dir__(self):
+        return list(self._fields)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self._fields}